@@ -1,15 +1,21 @@
 import os
 import sys
-import collections
+import gym
 import numpy as np
 
 import d4rl.infos
-from d4rl.offline_env import set_dataset_path, get_keys
+from d4rl.offline_env import set_dataset_path, set_dataset_cache, get_keys, WINDOW_ARGS, DatasetEnv, _key_selected
+from d4rl.utils.dataset_utils import infer_timeouts, episode_boundaries, IndexedColumn
+from d4rl.utils.shared_dataset import share_dataset
+from d4rl.utils.samplers import MinibatchSampler, TrajectorySampler
 
 SUPPRESS_MESSAGES = bool(os.environ.get('D4RL_SUPPRESS_IMPORT_ERROR', 0))
 
 _ERROR_MESSAGE = 'Warning: %s failed to import. Set the environment variable D4RL_SUPPRESS_IMPORT_ERROR=1 to suppress this message.'
 
+# Importing these modules only registers their envs with gym. Simulators such
+# as mujoco_py, pybullet, flow and CARLA are imported when gym.make resolves
+# the entry point of an env that needs them.
 try:
     import d4rl.locomotion
     import d4rl.hand_manipulation_suite
@@ -41,7 +47,7 @@ except ImportError as e:
     if not SUPPRESS_MESSAGES:
         print(_ERROR_MESSAGE % 'CARLA', file=sys.stderr)
         print(e, file=sys.stderr)
-        
+
 try:
     import d4rl.gym_bullet
     import d4rl.pointmaze_bullet
@@ -60,7 +66,58 @@ def get_normalized_score(env_name, score):
     ref_max_score = d4rl.infos.REF_MAX_SCORE[env_name]
     return (score - ref_min_score) / (ref_max_score - ref_min_score)
 
-def qlearning_dataset(env, dataset=None, terminate_on_end=False, **kwargs):
+def dataset_shapes(env_name):
+    """
+    Returns the (observation_shape, action_shape) of the dataset of a task,
+    or (None, None) if they are not listed in d4rl.infos.DATASET_SHAPES.
+    """
+    prefixes = [p for p in d4rl.infos.DATASET_SHAPES if env_name.startswith(p)]
+    if not prefixes:
+        return None, None
+    return d4rl.infos.DATASET_SHAPES[max(prefixes, key=len)]
+
+def make_dataset_env(env_name):
+    """
+    Returns a DatasetEnv for a registered task, without creating its
+    simulator. The dataset URL, reference scores and time limit are taken
+    from the gym registry, falling back to d4rl.infos.
+
+    The result can be passed to qlearning_dataset and sequence_dataset, and
+    supports get_dataset, get_episode_index and get_normalized_score, but
+    not reset or step.
+
+    Args:
+        env_name (str): A registered d4rl env id, such as 'hopper-medium-v2'.
+    """
+    spec = gym.spec(env_name)
+    kwargs = spec.kwargs or {}
+    dataset_url = kwargs.get('dataset_url') or d4rl.infos.DATASET_URLS.get(env_name)
+    if dataset_url is None:
+        raise ValueError('%s has no dataset' % env_name)
+    observation_shape, action_shape = dataset_shapes(env_name)
+    env = DatasetEnv(observation_shape=observation_shape,
+                     action_shape=action_shape,
+                     max_episode_steps=spec.max_episode_steps,
+                     dataset_url=dataset_url,
+                     ref_min_score=kwargs.get('ref_min_score', d4rl.infos.REF_MIN_SCORE.get(env_name)),
+                     ref_max_score=kwargs.get('ref_max_score', d4rl.infos.REF_MAX_SCORE.get(env_name)))
+    env.spec = spec
+    return env
+
+def load_dataset(env_name, **kwargs):
+    """
+    Loads the dataset of a registered task without creating its simulator.
+
+    This is equivalent to gym.make(env_name).get_dataset(**kwargs), and
+    runs the same checks, but works on hosts without MuJoCo, Flow or CARLA.
+
+    Args:
+        env_name (str): A registered d4rl env id, such as 'hopper-medium-v2'.
+        **kwargs: Arguments to pass to get_dataset().
+    """
+    return make_dataset_env(env_name).get_dataset(**kwargs)
+
+def qlearning_dataset(env, dataset=None, terminate_on_end=False, copy_next_observations=True, **kwargs):
     """
     Returns datasets formatted for use by standard Q-learning algorithms,
     with observations, actions, next_observations, rewards, and a terminal
@@ -73,7 +130,18 @@ def qlearning_dataset(env, dataset=None, terminate_on_end=False, **kwargs):
         terminate_on_end (bool): Set done=True on the last timestep
             in a trajectory. Default is False, and will discard the
             last timestep in each trajectory.
-        **kwargs: Arguments to pass to env.get_dataset().
+        copy_next_observations (bool): If False, next_observations is an
+            IndexedColumn which reads rows of the observations array through
+            an int32 index (next_observations.index) instead of a copy of
+            them, roughly halving peak memory. It can be indexed like an
+            array, and np.asarray() turns it into one.
+        **kwargs: Arguments to pass to env.get_dataset(). Unless keys are
+            given explicitly, only the keys needed here are loaded. Pass
+            shard_index and num_shards to load one episode-aligned shard,
+            or start, stop or episodes to load another window of rows. Only
+            the transitions from steps in the window are returned, and they
+            are the same as in the output for the whole dataset, so the
+            outputs of all shards concatenate to the unsharded output.
 
     Returns:
         A dictionary containing keys:
@@ -83,66 +151,96 @@ def qlearning_dataset(env, dataset=None, terminate_on_end=False, **kwargs):
             rewards: An N-dim float array of rewards.
             terminals: An N-dim boolean array of "done" or episode termination flags.
     """
+    restart_step = 1 if terminate_on_end else 0
+    start_step = 0
     if dataset is None:
+        kwargs.setdefault('keys', ['observations', 'actions', 'rewards', 'terminals', 'timeouts'])
+        window = {k: kwargs.pop(k) for k in WINDOW_ARGS if kwargs.get(k) is not None}
+        if window:
+            # Read one row past the window, which holds the next observation
+            # of its last step.
+            start, stop = env.dataset_rows(kwargs.get('h5path'), **window)
+            kwargs['start'], kwargs['stop'] = start, stop + 1
         dataset = env.get_dataset(**kwargs)
+        if window and start > 0 and 'timeouts' not in dataset:
+            # Count steps from the beginning of the dataset, as for the whole dataset.
+            prefix = env.get_dataset(h5path=kwargs.get('h5path'), keys=['terminals'], stop=start)
+            _, start_step = infer_timeouts(np.asarray(prefix['terminals'], dtype=np.bool_),
+                                           env._max_episode_steps, restart_step=restart_step,
+                                           return_step=True)
 
     N = dataset['rewards'].shape[0]
-    obs_ = []
-    next_obs_ = []
-    action_ = []
-    reward_ = []
-    done_ = []
+    terminals = np.asarray(dataset['terminals'][:N-1], dtype=np.bool_)
 
     # The newer version of the dataset adds an explicit
     # timeouts field. Keep old method for backwards compatability.
-    use_timeouts = False
     if 'timeouts' in dataset:
-        use_timeouts = True
-
-    episode_step = 0
-    for i in range(N-1):
-        obs = dataset['observations'][i].astype(np.float32)
-        new_obs = dataset['observations'][i+1].astype(np.float32)
-        action = dataset['actions'][i].astype(np.float32)
-        reward = dataset['rewards'][i].astype(np.float32)
-        done_bool = bool(dataset['terminals'][i])
-
-        if use_timeouts:
-            final_timestep = dataset['timeouts'][i]
-        else:
-            final_timestep = (episode_step == env._max_episode_steps - 1)
-        if (not terminate_on_end) and final_timestep:
-            # Skip this transition and don't apply terminals on the last step of an episode
-            episode_step = 0
-            continue  
-        if done_bool or final_timestep:
-            episode_step = 0
-
-        obs_.append(obs)
-        next_obs_.append(new_obs)
-        action_.append(action)
-        reward_.append(reward)
-        done_.append(done_bool)
-        episode_step += 1
+        final_timesteps = np.asarray(dataset['timeouts'][:N-1], dtype=np.bool_)
+    else:
+        final_timesteps = infer_timeouts(terminals, env._max_episode_steps,
+                                         restart_step=restart_step, start_step=start_step)
+
+    if terminate_on_end:
+        idxs = np.arange(N-1)
+    else:
+        # Skip the last step of an episode, it has no valid next observation.
+        idxs = np.flatnonzero(~final_timesteps)
+
+    if copy_next_observations:
+        observations = dataset['observations'][idxs].astype(np.float32)
+        next_observations = dataset['observations'][idxs+1].astype(np.float32)
+    else:
+        observations, next_observations = _indexed_next_observations(dataset['observations'], idxs)
 
     return {
-        'observations': np.array(obs_),
-        'actions': np.array(action_),
-        'next_observations': np.array(next_obs_),
-        'rewards': np.array(reward_),
-        'terminals': np.array(done_),
+        'observations': observations,
+        'actions': dataset['actions'][idxs].astype(np.float32),
+        'next_observations': next_observations,
+        'rewards': dataset['rewards'][idxs].astype(np.float32),
+        'terminals': terminals[idxs],
     }
 
 
-def sequence_dataset(env, dataset=None, **kwargs):
+def _indexed_next_observations(all_observations, idxs):
+    """
+    Gathers the observations at idxs, followed by the few next observations
+    which are not among them (the last step of each episode), into a single
+    array. Returns the observations and an IndexedColumn of the next
+    observations into that array.
+    """
+    next_rows = idxs + 1
+    pos = np.minimum(np.searchsorted(idxs, next_rows), max(len(idxs) - 1, 0))
+    found = (idxs[pos] == next_rows) if len(idxs) > 0 else np.zeros(0, dtype=np.bool_)
+    extra_rows = next_rows[~found]
+
+    num_rows = len(idxs) + len(extra_rows)
+    storage = np.empty((num_rows,) + tuple(all_observations.shape[1:]), dtype=np.float32)
+    storage[:len(idxs)] = all_observations[idxs]
+    storage[len(idxs):] = all_observations[extra_rows]
+
+    next_index = pos.astype(np.int32 if num_rows < 2**31 else np.int64)
+    next_index[~found] = len(idxs) + np.arange(len(extra_rows))
+    return storage[:len(idxs)], IndexedColumn(storage, next_index)
+
+
+def sequence_dataset(env, dataset=None, keys=None, **kwargs):
     """
     Returns an iterator through trajectories.
 
+    Episode boundaries are computed once up front, and each trajectory is
+    made of slices of the dataset arrays. These are views, so no data is
+    copied; copy them explicitly before modifying them in place.
+
     Args:
         env: An OfflineEnv object.
         dataset: An optional dataset to pass in for processing. If None,
             the dataset will default to env.get_dataset()
-        **kwargs: Arguments to pass to env.get_dataset().
+        keys: An optional list of names or glob patterns (such as
+            'infos/*') of the keys to include in each trajectory. Defaults
+            to every per-timestep key in the dataset, including infos/*
+            entries. Other keys are not loaded from disk.
+        **kwargs: Arguments to pass to env.get_dataset(). Pass shard_index
+            and num_shards to iterate over one episode-aligned shard.
 
     Returns:
         An iterator through dictionaries with keys:
@@ -152,35 +250,33 @@ def sequence_dataset(env, dataset=None, **kwargs):
             terminals
     """
     if dataset is None:
+        if keys is not None:
+            # rewards gives the number of steps, it is only yielded if selected.
+            kwargs.setdefault('keys', list(keys) + ['rewards'])
         dataset = env.get_dataset(**kwargs)
-
-    N = dataset['rewards'].shape[0]
-    data_ = collections.defaultdict(list)
-
-    # The newer version of the dataset adds an explicit
-    # timeouts field. Keep old method for backwards compatability.
-    use_timeouts = False
-    if 'timeouts' in dataset:
-        use_timeouts = True
-
-    episode_step = 0
-    for i in range(N):
-        done_bool = bool(dataset['terminals'][i])
-        if use_timeouts:
-            final_timestep = dataset['timeouts'][i]
+        # Episode boundaries of the stored dataset are cached on disk.
+        index = env.get_episode_index(h5path=kwargs.get('h5path'))
+        starts, lengths = index['starts'], index['lengths']
+        window = {k: kwargs[k] for k in WINDOW_ARGS if kwargs.get(k) is not None}
+        if window:
+            # Keep the episodes that lie entirely inside the rows that were loaded.
+            row_start, row_stop = env.dataset_rows(h5path=kwargs.get('h5path'), **window)
+            inside = (starts >= row_start) & (starts + lengths <= row_stop)
+            starts, lengths = starts[inside] - row_start, lengths[inside]
+    else:
+        terminals = np.asarray(dataset['terminals'], dtype=np.bool_)
+        # The newer version of the dataset adds an explicit
+        # timeouts field. Keep old method for backwards compatability.
+        if 'timeouts' in dataset:
+            timeouts = np.asarray(dataset['timeouts'], dtype=np.bool_)
         else:
-            final_timestep = (episode_step == env._max_episode_steps - 1)
-
-        for k in dataset:
-            data_[k].append(dataset[k][i])
+            timeouts = infer_timeouts(terminals, env._max_episode_steps, restart_step=1)
+        starts, lengths = episode_boundaries(terminals, timeouts)
 
-        if done_bool or final_timestep:
-            episode_step = 0
-            episode_data = {}
-            for k in data_:
-                episode_data[k] = np.array(data_[k])
-            yield episode_data
-            data_ = collections.defaultdict(list)
-
-        episode_step += 1
+    N = dataset['rewards'].shape[0]
+    # Skip scalar entries such as metadata, which are not per-timestep.
+    keys = [k for k in dataset if np.ndim(dataset[k]) > 0 and len(dataset[k]) == N
+            and _key_selected(k, keys)]
 
+    for start, length in zip(starts, lengths):
+        yield {k: dataset[k][start:start+length] for k in keys}
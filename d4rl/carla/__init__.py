@@ -1,7 +1,23 @@
-from .carla_env import CarlaObsDictEnv
-from .carla_env import CarlaObsEnv
+import importlib
+
 from gym.envs.registration import register
 
+_ENV_MODULES = {
+    'CarlaObsDictEnv': 'd4rl.carla.carla_env',
+    'CarlaObsEnv': 'd4rl.carla.carla_env',
+}
+
+
+def __getattr__(name):
+    # Env classes are imported when gym.make resolves their entry point, so
+    # that registering the envs does not import the CARLA client.
+    if name in _ENV_MODULES:
+        return getattr(importlib.import_module(_ENV_MODULES[name]), name)
+    if name == 'carla_env':
+        return importlib.import_module('d4rl.carla.carla_env')
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 
 register(
     id='carla-lane-v0',
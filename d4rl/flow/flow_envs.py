@@ -0,0 +1,127 @@
+import gym
+import os
+from d4rl import offline_env
+
+from copy import deepcopy
+
+import flow
+import flow.envs
+from flow.networks.ring import RingNetwork
+from flow.core.params import NetParams, VehicleParams, EnvParams, InFlows
+from flow.core.params import SumoLaneChangeParams, SumoCarFollowingParams
+from flow.networks.ring import ADDITIONAL_NET_PARAMS
+from flow.controllers.car_following_models import IDMController
+from flow.controllers.routing_controllers import ContinuousRouter 
+from flow.controllers import SimCarFollowingController, SimLaneChangeController
+from flow.controllers import RLController
+from flow.core.params import InitialConfig
+from flow.core.params import TrafficLightParams
+from flow.envs.ring.accel import AccelEnv
+from flow.core.params import SumoParams
+from flow.utils.registry import make_create_env
+from flow.envs import WaveAttenuationPOEnv
+from flow.envs import BayBridgeEnv, TrafficLightGridPOEnv
+
+from d4rl.flow import traffic_light_grid
+from d4rl.flow import merge
+from d4rl.flow import bottleneck
+
+def flow_register(flow_params, render=None, **kwargs):
+    if isinstance(flow_params, str):
+        flow_params = FLOW_PARAMS[flow_params](render=render)
+    exp_tag = flow_params["exp_tag"]
+    env_params = flow_params['env']
+    net_params = flow_params['net']
+    env_class = flow_params['env_name']
+    initial_config = flow_params.get('initial', InitialConfig())
+    traffic_lights = flow_params.get("tls", TrafficLightParams())
+    sim_params = deepcopy(flow_params['sim'])
+    vehicles = deepcopy(flow_params['veh'])
+
+    sim_params.render = render or sim_params.render
+
+    if isinstance(flow_params["network"], str):
+        print("""Passing of strings for network will be deprecated.
+        Please pass the Network instance instead.""")
+        module = __import__("flow.networks", fromlist=[flow_params["network"]])
+        network_class = getattr(module, flow_params["network"])
+    else:
+        network_class = flow_params["network"]
+
+    network = network_class(
+        name=exp_tag,
+        vehicles=vehicles,
+        net_params=net_params,
+        initial_config=initial_config,
+        traffic_lights=traffic_lights,
+    )
+
+    flow_env = env_class(
+        env_params= env_params,
+        sim_params= sim_params,
+        network= network,
+        simulator= flow_params['simulator']
+    )
+
+    env = offline_env.OfflineEnvWrapper(flow_env,
+        **kwargs
+    )
+    return env
+
+
+def ring_env(render='drgb'):
+    name = "ring"
+    network_name = RingNetwork
+    env_name = WaveAttenuationPOEnv
+
+    net_params = NetParams(additional_params=ADDITIONAL_NET_PARAMS)
+    initial_config = InitialConfig(spacing="uniform", shuffle=False)
+
+    vehicles = VehicleParams()
+    vehicles.add("human",
+                 acceleration_controller=(IDMController, {}),
+                 routing_controller=(ContinuousRouter, {}),
+                 num_vehicles=21)
+    vehicles.add(veh_id="rl",
+                 acceleration_controller=(RLController, {}),
+                 routing_controller=(ContinuousRouter, {}),
+                 num_vehicles=1)
+
+    sim_params = SumoParams(sim_step=0.5, render=render, save_render=True)
+    HORIZON=100
+    env_params = EnvParams(
+        # length of one rollout
+        horizon=HORIZON,
+        additional_params={
+            # maximum acceleration of autonomous vehicles
+            "max_accel": 1,
+            # maximum deceleration of autonomous vehicles
+            "max_decel": 1,
+            # bounds on the ranges of ring road lengths the autonomous vehicle 
+            # is trained on
+            "ring_length": [220, 270],
+        },
+    )
+
+
+    flow_params = dict(
+        exp_tag=name,
+        env_name=env_name,
+        network=network_name,
+        simulator='traci',
+        sim=sim_params,
+        env=env_params,
+        net=net_params,
+        veh=vehicles,
+        initial=initial_config
+    )
+    return flow_params
+
+
+# Functions generating the flow_params of each network, by name. The
+# registered envs refer to them by name so that flow is only imported once an
+# env is made.
+FLOW_PARAMS = {
+    'ring': ring_env,
+    'merge': merge.gen_env,
+}
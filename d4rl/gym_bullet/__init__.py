@@ -1,8 +1,17 @@
+import importlib
+
 from gym.envs.registration import register
-from d4rl.gym_bullet import gym_envs
 from d4rl import infos
 
 
+def __getattr__(name):
+    # Submodules that importing this package used to import are loaded on
+    # first access, so that registering the envs does not import pybullet.
+    if name == 'gym_envs':
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 for agent in ['hopper', 'halfcheetah', 'ant', 'walker2d']:
     register(
         id='bullet-%s-v0' % agent,
@@ -1,7 +1,16 @@
+import importlib
+
 from gym.envs.registration import register
-from d4rl.gym_mujoco import gym_envs
 from d4rl import infos
 
+
+def __getattr__(name):
+    # Submodules that importing this package used to import are loaded on
+    # first access, so that registering the envs does not import mujoco_py.
+    if name == 'gym_envs':
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
 # V1 envs
 for agent in ['hopper', 'halfcheetah', 'ant', 'walker2d']:
     for dataset in ['random', 'medium', 'expert', 'medium-expert', 'medium-replay', 'full-replay']:
@@ -1,11 +1,26 @@
+import importlib
+
 from gym.envs.registration import register
-from mjrl.envs.mujoco_env import MujocoEnv
-from d4rl.hand_manipulation_suite.door_v0 import DoorEnvV0
-from d4rl.hand_manipulation_suite.hammer_v0 import HammerEnvV0
-from d4rl.hand_manipulation_suite.pen_v0 import PenEnvV0
-from d4rl.hand_manipulation_suite.relocate_v0 import RelocateEnvV0
 from d4rl import infos
 
+_ENV_MODULES = {
+    'DoorEnvV0': 'd4rl.hand_manipulation_suite.door_v0',
+    'HammerEnvV0': 'd4rl.hand_manipulation_suite.hammer_v0',
+    'PenEnvV0': 'd4rl.hand_manipulation_suite.pen_v0',
+    'RelocateEnvV0': 'd4rl.hand_manipulation_suite.relocate_v0',
+}
+
+
+def __getattr__(name):
+    # Env classes are imported when gym.make resolves their entry point, so
+    # that registering the envs does not import mujoco_py and mjrl.
+    if name in _ENV_MODULES:
+        return getattr(importlib.import_module(_ENV_MODULES[name]), name)
+    if name in ('door_v0', 'hammer_v0', 'pen_v0', 'relocate_v0'):
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 # V1 envs
 MAX_STEPS = {'hammer': 200, 'relocate': 200, 'door': 200, 'pen': 100}
 ENV_MAPPING = {'hammer': 'HammerEnvV0', 'relocate': 'RelocateEnvV0', 'door': 'DoorEnvV0', 'pen': 'PenEnvV0'}
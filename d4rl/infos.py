@@ -291,3 +291,21 @@ for env in ['hammer', 'pen', 'relocate', 'door']:
         REF_MIN_SCORE[env_name] = REF_MIN_SCORE[env+'-human-v0']
         REF_MAX_SCORE[env_name] = REF_MAX_SCORE[env+'-human-v0']
 
+
+
+# Shapes of a single observation and action in the datasets of each family of
+# tasks, keyed by env id prefix. Used to validate datasets loaded with
+# d4rl.load_dataset, which does not create the env.
+DATASET_SHAPES = {
+    'maze2d-': ((4,), (2,)),
+    'antmaze-': ((29,), (8,)),
+    'hopper-': ((11,), (3,)),
+    'halfcheetah-': ((17,), (6,)),
+    'walker2d-': ((17,), (6,)),
+    'ant-': ((111,), (8,)),
+    'pen-': ((45,), (24,)),
+    'hammer-': ((46,), (26,)),
+    'door-': ((39,), (28,)),
+    'relocate-': ((39,), (30,)),
+    'kitchen-': ((60,), (9,)),
+}
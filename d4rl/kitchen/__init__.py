@@ -1,6 +1,26 @@
-from .kitchen_envs import KitchenMicrowaveKettleLightSliderV0, KitchenMicrowaveKettleBottomBurnerLightV0
+import importlib
+
 from gym.envs.registration import register
 
+# Registers kitchen_relax-v1. Only the env classes of adept_envs need dm_control.
+import d4rl.kitchen.adept_envs
+
+_ENV_MODULES = {
+    'KitchenMicrowaveKettleLightSliderV0': 'd4rl.kitchen.kitchen_envs',
+    'KitchenMicrowaveKettleBottomBurnerLightV0': 'd4rl.kitchen.kitchen_envs',
+}
+
+
+def __getattr__(name):
+    # Env classes are imported when gym.make resolves their entry point, so
+    # that registering the envs does not import dm_control.
+    if name in _ENV_MODULES:
+        return getattr(importlib.import_module(_ENV_MODULES[name]), name)
+    if name == 'kitchen_envs':
+        return importlib.import_module('d4rl.kitchen.kitchen_envs')
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 # Smaller dataset with only positive demonstrations.
 register(
     id='kitchen-complete-v0',
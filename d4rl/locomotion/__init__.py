@@ -1,7 +1,16 @@
+import importlib
+
 from gym.envs.registration import register
-from d4rl.locomotion import ant
 from d4rl.locomotion import maze_env
 
+
+def __getattr__(name):
+    # Submodules that importing this package used to import are loaded on
+    # first access, so that registering the envs does not import mujoco_py.
+    if name == 'ant':
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
 """
 register(
     id='antmaze-umaze-v0',
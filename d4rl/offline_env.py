@@ -1,10 +1,16 @@
+import fnmatch
+import hashlib
+import json
 import os
-import urllib.request
 
 import gym
 import h5py
+import numpy as np
 from tqdm import tqdm
 
+from d4rl.utils import dataset_cache, filelock, parallel_read
+from d4rl.utils.dataset_utils import infer_timeouts, episode_index, nstep_targets, shard_boundaries
+
 
 def set_dataset_path(path):
     global DATASET_PATH
@@ -15,6 +21,45 @@ def set_dataset_path(path):
 set_dataset_path(os.environ.get('D4RL_DATASET_DIR', os.path.expanduser('~/.d4rl/datasets')))
 
 
+def set_dataset_cache(enabled):
+    """
+    Sets whether get_dataset keeps an uncompressed copy of each dataset.
+
+    When enabled, the first load converts the HDF5 file into a directory of
+    uncompressed .npy columns next to it, and later loads read from that copy
+    without decompressing anything.
+    """
+    global DATASET_CACHE
+    DATASET_CACHE = enabled
+
+
+set_dataset_cache(bool(int(os.environ.get('D4RL_DATASET_CACHE', 0))))
+
+
+# Arguments of get_dataset that restrict which rows are read, see OfflineEnv.dataset_rows.
+WINDOW_ARGS = ('start', 'stop', 'episodes', 'shard_index', 'num_shards')
+
+# Expected sizes and SHA-256 checksums of dataset files, keyed by URL or
+# file name, used to verify downloads. Verification is opt-in: d4rl does not
+# ship a manifest, so unless one is loaded with load_dataset_manifest or
+# $D4RL_DATASET_MANIFEST, downloads are only checked against the size
+# reported by the server.
+DATASET_MANIFEST = {}
+
+
+def load_dataset_manifest(path):
+    """
+    Loads expected dataset sizes and checksums from a JSON file of the form
+    {"<url or file name>": {"size": <bytes>, "sha256": "<hex digest>"}}.
+    """
+    with open(path, 'r') as f:
+        DATASET_MANIFEST.update(json.load(f))
+
+
+if 'D4RL_DATASET_MANIFEST' in os.environ:
+    load_dataset_manifest(os.environ['D4RL_DATASET_MANIFEST'])
+
+
 def get_keys(h5file):
     keys = []
 
@@ -32,16 +77,177 @@ def filepath_from_url(dataset_url):
     return dataset_filepath
 
 
+def _dataset_needs_download(dataset_filepath, expected, remove_incomplete=False):
+    try:
+        size = os.path.getsize(dataset_filepath)
+    except FileNotFoundError:
+        return True
+    if expected.get('size') not in (None, size):
+        # Only done while holding the download lock, so that the file of
+        # another process is never removed while it is being moved into place.
+        if remove_incomplete:
+            print('Removing incomplete dataset:', dataset_filepath)
+            os.remove(dataset_filepath)
+        return True
+    return False
+
+
 def download_dataset_from_url(dataset_url):
     dataset_filepath = filepath_from_url(dataset_url)
-    if not os.path.exists(dataset_filepath):
-        print('Downloading dataset:', dataset_url, 'to', dataset_filepath)
-        urllib.request.urlretrieve(dataset_url, dataset_filepath)
+    expected = DATASET_MANIFEST.get(dataset_url, DATASET_MANIFEST.get(os.path.basename(dataset_filepath), {}))
+    if _dataset_needs_download(dataset_filepath, expected):
+        # Processes sharing DATASET_PATH wait here while one of them downloads.
+        with filelock.FileLock(dataset_filepath + '.lock'):
+            if _dataset_needs_download(dataset_filepath, expected, remove_incomplete=True):
+                print('Downloading dataset:', dataset_url, 'to', dataset_filepath)
+                # Imported here since urllib adds noticeably to the time taken by import d4rl.
+                from d4rl.utils import download
+                download.download(dataset_url, dataset_filepath,
+                                  size=expected.get('size'), sha256=expected.get('sha256'))
     if not os.path.exists(dataset_filepath):
         raise IOError("Failed to download dataset from %s" % dataset_url)
     return dataset_filepath
 
 
+def _key_selected(key, keys=None, exclude=None):
+    """Checks a dataset key against lists of names or glob patterns such as 'infos/*'."""
+    if keys is not None and not any(fnmatch.fnmatchcase(key, pattern) for pattern in keys):
+        return False
+    if exclude is not None and any(fnmatch.fnmatchcase(key, pattern) for pattern in exclude):
+        return False
+    return True
+
+
+def _needs_cast(dtype, stored_dtype):
+    # Only floating point columns are converted, flags and indices keep their type.
+    return dtype is not None and stored_dtype.kind == 'f' and stored_dtype != np.dtype(dtype)
+
+
+def _load_key(dset, decompress_workers=None, dtype=None, rows=None):
+    cast = dset.shape != () and _needs_cast(dtype, dset.dtype)
+    if decompress_workers is not None and parallel_read.supports_chunk_read(dset):
+        value = parallel_read.read_chunks(dset, num_workers=decompress_workers, rows=rows)
+        return value.astype(dtype) if cast else value
+    selection = slice(None) if rows is None else slice(*rows)
+    if cast:
+        return dset.astype(dtype)[selection]
+    try:  # first try loading as an array
+        return dset[selection]
+    except ValueError as e:  # try loading as a scalar
+        return dset[()]
+
+
+def _is_per_step(shape, num_rows):
+    return len(shape) > 0 and shape[0] == num_rows
+
+
+# Number of bytes read from each end of a file by file_fingerprint.
+FINGERPRINT_BLOCK_SIZE = 1 << 20
+
+
+def file_fingerprint(filepath):
+    """
+    Returns a short hex string which changes whenever a file is replaced or
+    modified.
+
+    It hashes the size and modification time of the file together with its
+    first and last FINGERPRINT_BLOCK_SIZE bytes, so it takes the same time
+    for any file size. Data derived from a dataset file, such as its episode
+    index and uncompressed copy, is keyed by it.
+    """
+    stat = os.stat(filepath)
+    sha256 = hashlib.sha256(b'%d-%d-' % (stat.st_size, stat.st_mtime_ns))
+    with open(filepath, 'rb') as f:
+        sha256.update(f.read(FINGERPRINT_BLOCK_SIZE))
+        if stat.st_size > FINGERPRINT_BLOCK_SIZE:
+            f.seek(max(FINGERPRINT_BLOCK_SIZE, stat.st_size - FINGERPRINT_BLOCK_SIZE))
+            sha256.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return sha256.hexdigest()
+
+
+def load_sidecar(h5path, name, key, compute_fn):
+    """
+    Loads arrays derived from an HDF5 file, computing them on first use.
+
+    Results are stored as <h5path without extension>_<name>.npz and are
+    recomputed whenever key no longer matches the stored one.
+
+    Args:
+        h5path (str): Path to the source HDF5 file.
+        name (str): Name of the sidecar.
+        key (str): Identifies the source file and parameters used, usually
+            derived from file_fingerprint(h5path).
+        compute_fn: A function returning a dictionary of arrays.
+
+    Returns:
+        The dictionary of arrays returned by compute_fn.
+    """
+    sidecar = '%s_%s.npz' % (os.path.splitext(h5path)[0], name)
+    try:
+        with np.load(sidecar) as cached:
+            if str(cached['key']) == key:
+                return {k: cached[k] for k in cached.files if k != 'key'}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    result = compute_fn()
+    try:
+        tmp_sidecar = '%s.tmp%d.npz' % (os.path.splitext(sidecar)[0], os.getpid())
+        np.savez(tmp_sidecar, key=np.array(key), **result)
+        os.replace(tmp_sidecar, sidecar)
+    except OSError:  # read-only dataset directory
+        pass
+    return result
+
+
+def _space_shape(space):
+    return getattr(space, 'shape', None)
+
+
+def check_dataset(data_dict, observation_shape=None, action_shape=None, keys=None, exclude=None):
+    """
+    Runs a few quick sanity checks on a loaded dataset, and flattens rewards
+    and terminals stored as N x 1 arrays.
+
+    Args:
+        data_dict: The dataset, as loaded by get_dataset.
+        observation_shape (tuple): Expected shape of a single observation,
+            or None to skip the check.
+        action_shape (tuple): Expected shape of a single action, or None to
+            skip the check.
+        keys, exclude: The key selection the dataset was loaded with.
+
+    Returns:
+        data_dict.
+    """
+    for key in ['observations', 'actions', 'rewards', 'terminals']:
+        if _key_selected(key, keys, exclude):
+            assert key in data_dict, 'Dataset is missing key %s' % key
+    sample_keys = [k for k in ['observations', 'actions', 'rewards', 'terminals'] if k in data_dict]
+    if not sample_keys:
+        return data_dict
+    N_samples = data_dict[sample_keys[0]].shape[0]
+    if 'observations' in data_dict and observation_shape is not None:
+        assert tuple(data_dict['observations'].shape[1:]) == tuple(observation_shape), \
+            'Observation shape does not match env: %s vs %s' % (
+                str(data_dict['observations'].shape[1:]), str(observation_shape))
+    if 'actions' in data_dict and action_shape is not None:
+        assert tuple(data_dict['actions'].shape[1:]) == tuple(action_shape), \
+            'Action shape does not match env: %s vs %s' % (
+                str(data_dict['actions'].shape[1:]), str(action_shape))
+    if 'rewards' in data_dict:
+        if data_dict['rewards'].shape == (N_samples, 1):
+            data_dict['rewards'] = data_dict['rewards'][:, 0]
+        assert data_dict['rewards'].shape == (N_samples,), 'Reward has wrong shape: %s' % (
+            str(data_dict['rewards'].shape))
+    if 'terminals' in data_dict:
+        if data_dict['terminals'].shape == (N_samples, 1):
+            data_dict['terminals'] = data_dict['terminals'][:, 0]
+        assert data_dict['terminals'].shape == (N_samples,), 'Terminals has wrong shape: %s' % (
+            str(data_dict['terminals'].shape))
+    return data_dict
+
+
 class OfflineEnv(gym.Env):
     """
     Base class for offline RL envs.
@@ -67,40 +273,239 @@ class OfflineEnv(gym.Env):
     def dataset_filepath(self):
         return filepath_from_url(self.dataset_url)
 
-    def get_dataset(self, h5path=None):
+    def _resolve_h5path(self, h5path):
         if h5path is None:
             if self._dataset_url is None:
                 raise ValueError("Offline env not configured with a dataset URL.")
             h5path = download_dataset_from_url(self.dataset_url)
+        return h5path
+
+    def dataset_rows(self, h5path=None, start=None, stop=None, episodes=None,
+                     shard_index=None, num_shards=None):
+        """
+        Returns the range of rows selected by the window arguments of get_dataset.
+
+        Args:
+            h5path (str): An optional path to an HDF5 file to use instead
+                of the dataset associated with this env.
+            start (int): First row, as in a Python slice.
+            stop (int): End of the rows, as in a Python slice.
+            episodes (slice): A contiguous range of episodes, in the order
+                given by get_episode_index(). Episodes are always returned
+                whole.
+            shard_index (int): Which of num_shards shards to select. Shards
+                are contiguous, of roughly equal size, and start and end on
+                episode boundaries.
+            num_shards (int): Total number of shards.
 
-        data_dict = {}
+        Returns:
+            A (start, stop) tuple of row indices.
+        """
+        h5path = self._resolve_h5path(h5path)
+        if shard_index is not None or num_shards is not None:
+            if start is not None or stop is not None or episodes is not None:
+                raise ValueError('Cannot combine shards with other row selections')
+            if shard_index is None or num_shards is None or not 0 <= shard_index < num_shards:
+                raise ValueError('Invalid shard %s of %s' % (shard_index, num_shards))
+            index = self.get_episode_index(h5path=h5path)
+            with h5py.File(h5path, 'r') as dataset_file:
+                num_rows = dataset_file['rewards'].shape[0]
+            boundaries = shard_boundaries(index['starts'], num_rows, num_shards)
+            return (int(boundaries[shard_index]), int(boundaries[shard_index+1]))
+        if episodes is not None:
+            if start is not None or stop is not None:
+                raise ValueError('Cannot select both rows and episodes')
+            index = self.get_episode_index(h5path=h5path)
+            first, last, step = episodes.indices(index['starts'].shape[0])
+            if step != 1:
+                raise ValueError('Episode ranges must be contiguous')
+            if last <= first:
+                return (0, 0)
+            return (int(index['starts'][first]), int(index['starts'][last-1] + index['lengths'][last-1]))
         with h5py.File(h5path, 'r') as dataset_file:
-            for k in tqdm(get_keys(dataset_file), desc="load datafile"):
-                try:  # first try loading as an array
-                    data_dict[k] = dataset_file[k][:]
-                except ValueError as e:  # try loading as a scalar
-                    data_dict[k] = dataset_file[k][()]
-
-        # Run a few quick sanity checks
-        for key in ['observations', 'actions', 'rewards', 'terminals']:
-            assert key in data_dict, 'Dataset is missing key %s' % key
-        N_samples = data_dict['observations'].shape[0]
-        if self.observation_space.shape is not None:
-            assert data_dict['observations'].shape[1:] == self.observation_space.shape, \
-                'Observation shape does not match env: %s vs %s' % (
-                    str(data_dict['observations'].shape[1:]), str(self.observation_space.shape))
-        assert data_dict['actions'].shape[1:] == self.action_space.shape, \
-            'Action shape does not match env: %s vs %s' % (
-                str(data_dict['actions'].shape[1:]), str(self.action_space.shape))
-        if data_dict['rewards'].shape == (N_samples, 1):
-            data_dict['rewards'] = data_dict['rewards'][:, 0]
-        assert data_dict['rewards'].shape == (N_samples,), 'Reward has wrong shape: %s' % (
-            str(data_dict['rewards'].shape))
-        if data_dict['terminals'].shape == (N_samples, 1):
-            data_dict['terminals'] = data_dict['terminals'][:, 0]
-        assert data_dict['terminals'].shape == (N_samples,), 'Terminals has wrong shape: %s' % (
-            str(data_dict['rewards'].shape))
-        return data_dict
+            num_rows = dataset_file['rewards'].shape[0]
+        start, stop, _ = slice(start, stop).indices(num_rows)
+        return (start, max(start, stop))
+
+    def get_dataset(self, h5path=None, lazy=False, cache=None, decompress_workers=None,
+                    keys=None, exclude=None, dtype=None, start=None, stop=None, episodes=None,
+                    shard_index=None, num_shards=None):
+        """
+        Returns the offline dataset for this env.
+
+        When a range of rows is selected (with start, stop, episodes or
+        shard_index), array keys which do not hold one entry per row, such as
+        the virtual/* chunks of chunked datasets, are left out.
+
+        Args:
+            h5path (str): An optional path to an HDF5 file to load instead
+                of the dataset associated with this env.
+            lazy (bool): If True, the file is converted once into an
+                uncompressed copy next to h5path, and every column is returned
+                as a read-only memory-mapped array that is paged in on access.
+            cache (bool): If True, read the columns from the uncompressed copy
+                used by lazy mode, creating it on first use. Defaults to the
+                value set by set_dataset_cache, or the D4RL_DATASET_CACHE
+                environment variable.
+            decompress_workers (int): If set, gzip-compressed keys are read
+                as raw chunks and inflated by this many threads instead of
+                by h5py on a single thread. The result is identical.
+            keys (list): Names or glob patterns (such as 'infos/*') of the
+                keys to load. Other keys are never read from disk. Defaults
+                to all keys.
+            exclude (list): Names or glob patterns of keys to skip.
+            dtype: If set, floating point columns are converted to this type
+                while they are read. Cannot be combined with lazy=True for
+                columns stored with a different type.
+            start (int): If set, only rows from start onwards are read.
+            stop (int): If set, only rows before stop are read.
+            episodes (slice): If set, only the rows of this range of
+                episodes are read. See dataset_rows.
+            shard_index (int): If set together with num_shards, only the
+                rows of this shard are read. Shards are cut on episode
+                boundaries, for data-parallel training. See dataset_rows.
+            num_shards (int): Total number of shards.
+
+        Returns:
+            A dictionary containing observations, actions, rewards, terminals
+            and any additional keys stored in the file.
+        """
+        h5path = self._resolve_h5path(h5path)
+        rows = None
+        if any(arg is not None for arg in (start, stop, episodes, shard_index, num_shards)):
+            rows = self.dataset_rows(h5path, start=start, stop=stop, episodes=episodes,
+                                     shard_index=shard_index, num_shards=num_shards)
+
+        def select_keys(available_keys):
+            return [k for k in available_keys if _key_selected(k, keys, exclude)]
+
+        if cache is None:
+            cache = DATASET_CACHE
+        if lazy or cache:
+            # A window is cut from the memory-mapped copy, so only its rows are read.
+            data_dict = dataset_cache.load_or_build_cache(h5path, file_fingerprint(h5path),
+                                                          mmap=lazy or rows is not None,
+                                                          num_workers=decompress_workers,
+                                                          select_keys=select_keys)
+            if rows is not None:
+                with h5py.File(h5path, 'r') as dataset_file:
+                    num_rows = dataset_file['rewards'].shape[0]
+            for k, value in list(data_dict.items()):
+                if not isinstance(value, np.ndarray):
+                    continue
+                if rows is not None and value.ndim > 0:
+                    if not _is_per_step(value.shape, num_rows):
+                        del data_dict[k]
+                        continue
+                    value = value[rows[0]:rows[1]]
+                cast = _needs_cast(dtype, value.dtype)
+                if lazy:
+                    if cast:
+                        raise ValueError('Key %s is stored as %s, it cannot be converted to %s with lazy=True' % (
+                            k, value.dtype, np.dtype(dtype)))
+                elif cast or isinstance(value, np.memmap):
+                    value = np.array(value, dtype=dtype if cast else value.dtype)
+                data_dict[k] = value
+        else:
+            data_dict = {}
+            with h5py.File(h5path, 'r') as dataset_file:
+                num_rows = dataset_file['rewards'].shape[0]
+                for k in tqdm(select_keys(get_keys(dataset_file)), desc="load datafile"):
+                    dset = dataset_file[k]
+                    if rows is not None and dset.shape != () and not _is_per_step(dset.shape, num_rows):
+                        # Such as the virtual/* chunks of chunked datasets,
+                        # which would be read in full.
+                        continue
+                    data_dict[k] = _load_key(dset, decompress_workers=decompress_workers, dtype=dtype,
+                                             rows=rows if dset.shape != () else None)
+
+        return check_dataset(data_dict, observation_shape=_space_shape(self.observation_space),
+                             action_shape=_space_shape(self.action_space), keys=keys, exclude=exclude)
+
+    def get_episode_index(self, h5path=None):
+        """
+        Returns start offsets, lengths, returns and end flags of all episodes.
+
+        The index is computed once per dataset file from its terminals, timeouts
+        and rewards, and cached next to the file keyed by its file_fingerprint.
+        Datasets without a timeouts field use the env time limit to find the
+        ends of episodes, in the same way as d4rl.sequence_dataset.
+
+        Args:
+            h5path (str): An optional path to an HDF5 file to index instead
+                of the dataset associated with this env.
+
+        Returns:
+            A dictionary containing starts, lengths, returns and terminals
+            arrays with one entry per episode. See
+            d4rl.utils.dataset_utils.episode_index.
+        """
+        return self._load_episode_sidecar(h5path, 'episodes', episode_index, restart_step=1)
+
+    def get_return_targets(self, discount=0.99, n_step=1, h5path=None):
+        """
+        Returns discounted returns-to-go and n-step targets for every step of
+        the dataset.
+
+        The targets are computed once per dataset file, discount and n_step,
+        and cached next to the file keyed by its file_fingerprint. Datasets
+        without a timeouts field use the env time limit to find the ends of
+        episodes, in the same way as d4rl.qlearning_dataset.
+
+        Args:
+            discount (float): Discount factor.
+            n_step (int): Maximum number of rewards summed before bootstrapping.
+            h5path (str): An optional path to an HDF5 file to use instead of
+                the dataset associated with this env.
+
+        Returns:
+            A dictionary of arrays with one entry per step. See
+            d4rl.utils.dataset_utils.nstep_targets.
+        """
+        def compute_targets(rewards, terminals, timeouts):
+            return nstep_targets(rewards, terminals, timeouts, discount, n_step)
+
+        return self._load_episode_sidecar(h5path, 'returns_%r_%d' % (discount, n_step), compute_targets,
+                                          restart_step=0)
+
+    def _load_episode_sidecar(self, h5path, name, compute_fn, restart_step):
+        """
+        Computes compute_fn(rewards, terminals, timeouts) for the dataset in
+        h5path once, and caches the result with load_sidecar.
+
+        Datasets without timeouts infer them from the env time limit with
+        infer_timeouts(restart_step=restart_step), and the time limit becomes
+        part of the sidecar key.
+        """
+        h5path = self._resolve_h5path(h5path)
+
+        with h5py.File(h5path, 'r') as dataset_file:
+            has_timeouts = 'timeouts' in dataset_file
+        if has_timeouts:
+            key = file_fingerprint(h5path)
+        else:
+            max_episode_steps = self._get_max_episode_steps()
+            key = '%s-%d' % (file_fingerprint(h5path), max_episode_steps)
+
+        def compute():
+            with h5py.File(h5path, 'r') as dataset_file:
+                rewards = dataset_file['rewards'][:].reshape(-1)
+                terminals = dataset_file['terminals'][:].reshape(-1).astype(np.bool_)
+                if has_timeouts:
+                    timeouts = dataset_file['timeouts'][:].reshape(-1).astype(np.bool_)
+                else:
+                    timeouts = infer_timeouts(terminals, max_episode_steps, restart_step=restart_step)
+            return compute_fn(rewards, terminals, timeouts)
+
+        return load_sidecar(h5path, name, key, compute)
+
+    def _get_max_episode_steps(self):
+        max_episode_steps = getattr(self, '_max_episode_steps', None)
+        if max_episode_steps is None and self.spec is not None:
+            max_episode_steps = self.spec.max_episode_steps
+        if max_episode_steps is None:
+            raise ValueError("Dataset has no timeouts and the env has no time limit.")
+        return max_episode_steps
 
     def get_dataset_chunk(self, chunk_id, h5path=None):
         """
@@ -142,3 +547,40 @@ class OfflineEnvWrapper(gym.Wrapper, OfflineEnv):
 
     def reset(self):
         return self.env.reset()
+
+
+class DatasetEnv(OfflineEnv):
+    """
+    An OfflineEnv which only provides the dataset of a task, so that it can
+    be loaded without creating the task's simulator. reset() and step()
+    raise gym.error.Error.
+
+    Args:
+        observation_shape (tuple): Shape of a single observation, if known.
+            Used to validate the dataset.
+        action_shape (tuple): Shape of a single action, if known.
+        max_episode_steps (int): Time limit of the task, used to find the
+            ends of episodes in datasets without timeouts.
+        **kwargs: Arguments to OfflineEnv, such as dataset_url.
+    """
+
+    def __init__(self, observation_shape=None, action_shape=None, max_episode_steps=None, **kwargs):
+        OfflineEnv.__init__(self, **kwargs)
+        self.observation_space = None
+        self.action_space = None
+        if observation_shape is not None:
+            self.observation_space = gym.spaces.Box(-np.inf, np.inf, shape=observation_shape, dtype=np.float32)
+        if action_shape is not None:
+            self.action_space = gym.spaces.Box(-1., 1., shape=action_shape, dtype=np.float32)
+        self._max_episode_steps = max_episode_steps
+
+    def _not_simulated(self):
+        env_name = "'%s'" % self.spec.id if self.spec is not None else 'env_name'
+        return gym.error.Error('DatasetEnv only provides the dataset of a task, it cannot be reset or stepped. '
+                               'Create the env with gym.make(%s) to simulate it.' % env_name)
+
+    def reset(self, **kwargs):
+        raise self._not_simulated()
+
+    def step(self, action):
+        raise self._not_simulated()
@@ -1,6 +1,19 @@
-from .maze_model import MazeEnv, OPEN, U_MAZE, MEDIUM_MAZE, LARGE_MAZE, U_MAZE_EVAL, MEDIUM_MAZE_EVAL, LARGE_MAZE_EVAL
+import importlib
+
+from .maze_layouts import OPEN, U_MAZE, MEDIUM_MAZE, LARGE_MAZE, U_MAZE_EVAL, MEDIUM_MAZE_EVAL, LARGE_MAZE_EVAL
 from gym.envs.registration import register
 
+
+def __getattr__(name):
+    # MazeEnv is imported when gym.make resolves its entry point, so that
+    # registering the envs does not import mujoco_py.
+    if name == 'MazeEnv':
+        return importlib.import_module('d4rl.pointmaze.maze_model').MazeEnv
+    if name == 'maze_model':
+        return importlib.import_module('d4rl.pointmaze.maze_model')
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
 register(
     id='maze2d-open-v0',
     entry_point='d4rl.pointmaze:MazeEnv',
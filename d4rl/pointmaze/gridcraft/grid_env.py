@@ -1,5 +1,6 @@
 import sys
 import numpy as np
+import scipy.sparse
 import gym
 import gym.spaces
 
@@ -50,6 +51,33 @@ class TransitionModel(object):
         moves.add(ACT_NOOP)
         return moves
 
+    def get_all_aprobs(self):
+        """Computes get_aprobs for every state and action at once.
+
+        Returns:
+          next_states: A dS x dA array of the state reached by executing each
+            action from each state. Moves that would leave the grid stay in
+            place.
+          aprobs: A dS x dA x dA array where aprobs[s, a] equals
+            get_aprobs(s, a).
+        """
+        ds = len(self.gs)
+        tiles = self.gs.spec.T.reshape(-1)
+        xy = self.gs.idx_to_xy(np.arange(ds))
+        moves = np.array([ACT_DICT[move] for move in range(len(ACT_DICT))])
+        next_x = xy[:, 0:1] + moves[:, 0]
+        next_y = xy[:, 1:2] + moves[:, 1]
+        in_bounds = (next_x >= 0) & (next_x < self.gs.width) & (next_y >= 0) & (next_y < self.gs.height)
+        next_states = np.where(in_bounds, next_x + next_y * self.gs.width, np.arange(ds)[:, None])
+        legal = in_bounds & (tiles[next_states] != WALL)
+        legal[:, ACT_NOOP] = True
+
+        num_moves = len(ACT_DICT)
+        aprobs = np.repeat((legal * (self.eps / legal.sum(axis=1, keepdims=True)))[:, None, :], num_moves, axis=1)
+        executed = np.where(legal, np.arange(num_moves), ACT_NOOP)
+        aprobs[np.arange(ds)[:, None], np.arange(num_moves), executed] += 1.0 - self.eps
+        return next_states, aprobs
+
 
 class RewardFunction(object):
     def __init__(self, rew_map=None, default=0):
@@ -64,6 +92,14 @@ class RewardFunction(object):
         self.default = default
         self.rew_map = rew_map
 
+    def state_rewards(self, gridspec):
+        """Returns the reward of leaving each state, as a dS array."""
+        tiles = gridspec.spec.T.reshape(-1)
+        rewards = np.full(tiles.shape, self.default, dtype=np.float64)
+        for tile, rew in self.rew_map.items():
+            rewards[tiles == tile] = rew
+        return rewards
+
     def __call__(self, gridspec, s, a, ns):
         val = gridspec[gridspec.idx_to_xy(s)]
         if val in self.rew_map:
@@ -182,15 +218,32 @@ class GridEnv(gym.Env):
           corrsponds to the probability of transitioning into state ns after taking
           action a from state s.
         """
+        return self.sparse_transition_matrix().toarray().reshape(self.num_states, self.num_actions, self.num_states)
+
+    def sparse_transition_matrix(self):
+        """Constructs this environment's transition matrix as a sparse matrix.
+
+        The matrix is built directly from the grid, with one row per state and
+        action, so it only stores the few states reachable from each.
+
+        Returns:
+          A (dS*dA) x dS CSR matrix where the entry
+          transition_matrix[s*dA + a, ns] corresponds to the probability of
+          transitioning into state ns after taking action a from state s.
+        """
         ds = self.num_states
         da = self.num_actions
-        transition_matrix = np.zeros((ds, da, ds))
-        for s in range(ds):
-            for a in range(da):
-                transitions = self.get_transitions(s,a)
-                for next_s in transitions:
-                    transition_matrix[s, a, next_s] = transitions[next_s]
-        return transition_matrix
+        next_states, aprobs = self.model.get_all_aprobs()
+        next_states = np.broadcast_to(next_states[:, None, :], aprobs.shape)
+        lava = self.gs.spec.T.reshape(-1) == LAVA  # Lava gets you stuck
+        aprobs[lava] = 0.0
+        aprobs[lava, :, ACT_NOOP] = 1.0
+
+        rows = np.broadcast_to(np.arange(ds * da).reshape(ds, da, 1), aprobs.shape)
+        nonzero = aprobs > 0
+        # Duplicate entries, such as several moves blocked by walls, are summed.
+        return scipy.sparse.csr_matrix(
+            (aprobs[nonzero], (rows[nonzero], next_states[nonzero])), shape=(ds * da, ds))
 
     def reward_matrix(self):
         """Constructs this environment's reward matrix.
@@ -202,9 +255,39 @@ class GridEnv(gym.Env):
         """
         ds = self.num_states
         da = self.num_actions
+        if isinstance(self.rew_fn, RewardFunction):
+            rewards = self.rew_fn.state_rewards(self.gs)
+            return np.broadcast_to(rewards[:, None, None], (ds, da, ds)).copy()
         rew_matrix = np.zeros((ds, da, ds))
         for s in range(ds):
             for a in range(da):
                 for ns in range(ds):
                     rew_matrix[s, a, ns] = self.rew_fn(self.gs, s, a, ns)
         return rew_matrix
+
+    def sparse_reward_matrix(self):
+        """Constructs this environment's reward matrix as a sparse matrix.
+
+        Only the rewards of possible transitions are stored. For reward
+        functions other than RewardFunction, these are the only transitions
+        it is called on.
+
+        Returns:
+          A (dS*dA) x dS CSR matrix with the same layout and entries as
+          sparse_transition_matrix(), where the entry
+          reward_matrix[s*dA + a, ns] is the reward given to an agent when
+          transitioning into state ns after taking action a from state s.
+        """
+        ds = self.num_states
+        da = self.num_actions
+        transitions = self.sparse_transition_matrix()
+        rows = np.repeat(np.arange(ds * da), np.diff(transitions.indptr))
+        states, actions = np.divmod(rows, da)
+        if isinstance(self.rew_fn, RewardFunction):
+            rewards = self.rew_fn.state_rewards(self.gs)[states]
+        else:
+            rewards = np.array([self.rew_fn(self.gs, s, a, ns)
+                                for s, a, ns in zip(states, actions, transitions.indices)], dtype=np.float64)
+        # Rewards of zero are stored explicitly, so that both matrices share one layout.
+        return scipy.sparse.csr_matrix((rewards, transitions.indices.copy(), transitions.indptr.copy()),
+                                       shape=transitions.shape)
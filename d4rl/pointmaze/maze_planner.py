@@ -0,0 +1,115 @@
+"""
+Goal-conditioned planning on the grid of a maze.
+
+A MazePlanner solves every start and goal cell of a maze at once, by computing
+the shortest-path distance between all pairs of free cells. Paths between any
+two cells are then read off the distance table instead of being planned
+again. Planners are cached per maze string by get_planner.
+"""
+import functools
+
+import numpy as np
+import scipy.sparse
+from scipy.sparse import csgraph
+
+from d4rl.pointmaze.gridcraft import grid_env
+from d4rl.pointmaze.gridcraft import grid_spec
+
+# Number of source cells whose distances are computed together.
+DISTANCE_BLOCK_SIZE = 1024
+
+
+class MazePlanner(object):
+    """
+    All-pairs shortest paths between the free cells of a maze.
+
+    Moves follow a deterministic GridEnv on the maze: each step moves to one
+    of the four neighbouring cells, unless it is a wall. Cells are (x, y)
+    tuples in the coordinates used by GridEnv and WaypointController.
+
+    Args:
+        maze_str (str): The maze, in the format of
+            grid_spec.spec_from_string.
+    """
+
+    def __init__(self, maze_str):
+        self.maze_str = maze_str
+        self.env = grid_env.GridEnv(grid_spec.spec_from_string(maze_str))
+        gs = self.env.gs
+        num_states = len(gs)
+        tiles = gs.spec.T.reshape(-1)
+
+        # free_states[i] is the GridEnv state of free cell i.
+        self.free_states = np.nonzero(tiles != grid_spec.WALL)[0]
+        self._free_index = np.full(num_states, -1, dtype=np.int64)
+        self._free_index[self.free_states] = np.arange(self.free_states.shape[0])
+
+        next_states, aprobs = self.env.model.get_all_aprobs()
+        # With no action noise, a move is legal iff it is always executed.
+        legal = np.diagonal(aprobs, axis1=1, axis2=2) > 0
+        next_states, legal = next_states[self.free_states], legal[self.free_states]
+        # Illegal moves stay in place, so they never get closer to a target.
+        self._moves = np.where(legal, self._free_index[next_states], np.arange(len(self.free_states))[:, None])
+
+        num_free = self.free_states.shape[0]
+        sources = np.repeat(np.arange(num_free), legal.shape[1])
+        edges = self._moves.reshape(-1)
+        keep = edges != sources
+        graph = scipy.sparse.csr_matrix((np.ones(keep.sum()), (sources[keep], edges[keep])),
+                                        shape=(num_free, num_free))
+        dtype = np.int16 if num_free < np.iinfo(np.int16).max else np.int32
+        # distances[i, j] is the number of steps from free cell i to free
+        # cell j, or -1 if j cannot be reached.
+        self.distances = np.empty((num_free, num_free), dtype=dtype)
+        for start in range(0, num_free, DISTANCE_BLOCK_SIZE):
+            block = np.arange(start, min(start + DISTANCE_BLOCK_SIZE, num_free))
+            dist = csgraph.shortest_path(graph, indices=block, unweighted=True)
+            dist[np.isinf(dist)] = -1
+            self.distances[block] = dist
+
+    def _cell_index(self, cell):
+        state = self.env.gs.xy_to_idx(cell)
+        if self.env.gs.out_of_bounds(cell) or self._free_index[state] < 0:
+            raise ValueError('Cell %s is not a free cell of the maze' % (tuple(cell),))
+        return self._free_index[state]
+
+    @property
+    def free_cells(self):
+        """The (x, y) coordinates of every free cell, as an F x 2 array."""
+        return self.env.gs.idx_to_xy(self.free_states)
+
+    def distance(self, start, target):
+        """Returns the number of steps from cell start to cell target, or -1 if it is unreachable."""
+        return int(self.distances[self._cell_index(start), self._cell_index(target)])
+
+    def path(self, start, target):
+        """
+        Returns a shortest path between two cells.
+
+        Among equally short paths, earlier actions of GridEnv are preferred,
+        as with the argmax of its Q-values.
+
+        Args:
+            start: The (x, y) cell to start from.
+            target: The (x, y) cell to reach.
+
+        Returns:
+            A list of the (x, y) cells visited after start, ending with
+            target. Empty if start is target.
+        """
+        i, j = self._cell_index(start), self._cell_index(target)
+        to_target = self.distances[:, j]
+        if to_target[i] < 0:
+            raise ValueError('Cell %s cannot be reached from %s' % (tuple(target), tuple(start)))
+        path = []
+        while i != j:
+            moves = self._moves[i]
+            i = moves[np.argmin(np.where(to_target[moves] >= 0, to_target[moves], np.iinfo(np.int32).max))]
+            path.append(tuple(int(c) for c in self.env.gs.idx_to_xy(self.free_states[i])))
+        return path
+
+
+@functools.lru_cache(maxsize=8)
+def get_planner(maze_str):
+    """Returns the MazePlanner of a maze, creating it on first use."""
+    return MazePlanner(maze_str)
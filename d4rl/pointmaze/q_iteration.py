@@ -4,6 +4,7 @@ Use q-iteration to solve for an optimal policy
 Usage: q_iteration(env, gamma=discount factor, ent_wt= entropy bonus)
 """
 import numpy as np
+import scipy.sparse
 from scipy.special import logsumexp as sp_lse
 
 def softmax(q, alpha=1.0):
@@ -33,36 +34,137 @@ def get_policy(q_fn, ent_wt=1.0):
     return pol_probs
 
 
-def softq_iteration(env, transition_matrix=None, reward_matrix=None, num_itrs=50, discount=0.99, ent_wt=0.1, warmstart_q=None, policy=None):
+def sparse_transitions(transition_matrix, dim_obs, dim_act):
+    """Returns a transition matrix as a (dS*dA) x dS CSR matrix.
+
+    Accepts the output of GridEnv.sparse_transition_matrix(), or a dense
+    dS x dA x dS array such as the output of GridEnv.transition_matrix().
+    """
+    if scipy.sparse.issparse(transition_matrix):
+        return transition_matrix.tocsr()
+    return scipy.sparse.csr_matrix(np.reshape(transition_matrix, (dim_obs * dim_act, dim_obs)))
+
+
+def expected_rewards(reward_matrix, t_matrix, dim_obs, dim_act):
+    """Returns the dS x dA expected reward of taking each action in each state."""
+    t_matrix = t_matrix.tocoo()
+    if scipy.sparse.issparse(reward_matrix):
+        rewards = np.asarray(reward_matrix.tocsr()[t_matrix.row, t_matrix.col]).reshape(-1)
+    else:
+        rewards = np.reshape(reward_matrix, (dim_obs * dim_act, dim_obs))[t_matrix.row, t_matrix.col]
+    return np.bincount(t_matrix.row, weights=t_matrix.data * rewards,
+                       minlength=dim_obs * dim_act).reshape(dim_obs, dim_act)
+
+
+def softq_iteration(env, transition_matrix=None, reward_matrix=None, num_itrs=50, discount=0.99, ent_wt=0.1, warmstart_q=None, policy=None,
+                    tol=None, return_info=False):
     """
     Perform tabular soft Q-iteration
+
+    Transition and reward matrices may be given in the sparse (dS*dA) x dS
+    layout of GridEnv.sparse_transition_matrix() and sparse_reward_matrix(),
+    which are used by default, or as dense dS x dA x dS arrays. Each
+    iteration costs time proportional to the number of nonzero transitions.
+    The reward of an action is its expected reward over next states.
+
+    Args:
+        num_itrs (int): Number of iterations, or the maximum number of
+            iterations if tol is set.
+        tol (float): If set, stop once the Bellman residual, the largest
+            change of any Q-value in one iteration, falls below tol.
+        warmstart_q: Initial Q-values. Solutions for a related task, such as
+            the same maze with a nearby goal, usually converge in far fewer
+            iterations than starting from zeros.
+        return_info (bool): If True, also return a dictionary with the
+            number of iterations run and the final residual.
+
+    Returns:
+        A dS x dA array of Q-values, and the info dictionary if
+        return_info is True.
     """
     dim_obs = env.num_states
     dim_act = env.num_actions
+    if transition_matrix is None:
+        transition_matrix = env.sparse_transition_matrix()
+    t_matrix = sparse_transitions(transition_matrix, dim_obs, dim_act)
+
     if reward_matrix is None:
-        reward_matrix = env.reward_matrix()
-    reward_matrix = reward_matrix[:,:,0]
+        reward_matrix = env.sparse_reward_matrix()
+    reward_matrix = expected_rewards(reward_matrix, t_matrix, dim_obs, dim_act)
 
     if warmstart_q is None:
         q_fn = np.zeros((dim_obs, dim_act))
     else:
-        q_fn = warmstart_q
-
-    if transition_matrix is None:
-        t_matrix = env.transition_matrix()
-    else:
-        t_matrix = transition_matrix
+        q_fn = np.array(warmstart_q, dtype=np.float64)
+    if policy is not None:
+        log_policy = np.log(policy)
 
-    for k in range(num_itrs):
+    residual = np.inf
+    k = 0
+    while k < num_itrs:
         if policy is None:
             v_fn = logsumexp(q_fn, alpha=ent_wt)
         else:
-            v_fn = np.sum((q_fn - ent_wt*np.log(policy))*policy, axis=1)
-        new_q = reward_matrix + discount*t_matrix.dot(v_fn)
+            v_fn = np.sum((q_fn - ent_wt*log_policy)*policy, axis=1)
+        new_q = reward_matrix + discount*t_matrix.dot(v_fn).reshape(dim_obs, dim_act)
+        residual = np.max(np.abs(new_q - q_fn))
         q_fn = new_q
+        k += 1
+        if tol is not None and residual < tol:
+            break
+    if return_info:
+        return q_fn, {'iterations': k, 'residual': float(residual)}
     return q_fn
 
 
+def multigoal_value_iteration(transition_matrix, goal_states, dim_obs, dim_act, num_itrs=50, discount=0.99, ent_wt=0.0,
+                              tol=None, return_info=False):
+    """
+    Solves soft Q-iteration for many goals at once.
+
+    The task for goal g rewards every step taken from state goal_states[g],
+    like a REWARD tile in a GridEnv. All goals share the same transitions, so
+    a single sparse product per iteration updates the values of every goal.
+    Each iteration holds a dS x dA x G array, so very large sets of goals
+    should be solved in batches.
+
+    Args:
+        transition_matrix: Transitions in any layout accepted by
+            softq_iteration.
+        goal_states: A length G array of goal states.
+        num_itrs (int): Number of iterations, or the maximum number of
+            iterations if tol is set.
+        ent_wt (float): Entropy weight. 0 solves hard Q-iteration.
+        tol (float): If set, stop once no value changes by more than tol.
+        return_info (bool): If True, also return a dictionary with the
+            number of iterations run and the final residual.
+
+    Returns:
+        A dS x G array with the value of each state for each goal, and the
+        info dictionary if return_info is True.
+    """
+    t_matrix = sparse_transitions(transition_matrix, dim_obs, dim_act)
+    goal_states = np.asarray(goal_states)
+    num_goals = goal_states.shape[0]
+    rewards = np.zeros((dim_obs, 1, num_goals))
+    rewards[goal_states, 0, np.arange(num_goals)] = 1.0
+
+    v_fn = np.zeros((dim_obs, num_goals))
+    residual = np.inf
+    k = 0
+    while k < num_itrs:
+        q_fn = rewards + discount*t_matrix.dot(v_fn).reshape(dim_obs, dim_act, num_goals)
+        new_v = logsumexp(q_fn, alpha=ent_wt, axis=1)
+        residual = np.max(np.abs(new_v - v_fn))
+        v_fn = new_v
+        k += 1
+        if tol is not None and residual < tol:
+            break
+    if return_info:
+        return v_fn, {'iterations': k, 'residual': float(residual)}
+    return v_fn
+
+
 def q_iteration(env, **kwargs):
     return softq_iteration(env, ent_wt=0.0, **kwargs)
 
@@ -75,7 +177,7 @@ def compute_visitation(env, q_fn, ent_wt=1.0, env_time_limit=50, discount=1.0):
   state_visitation = np.zeros((dim_obs, 1))
   for (state, prob) in env.initial_state_distribution.items():
     state_visitation[state] = prob
-  t_matrix = env.transition_matrix()  # S x A x S
+  t_matrix = env.sparse_transition_matrix()  # SA x S
   sa_visit_t = np.zeros((dim_obs, dim_act, env_time_limit))
 
   for i in range(env_time_limit):
@@ -83,7 +185,7 @@ def compute_visitation(env, q_fn, ent_wt=1.0, env_time_limit=50, discount=1.0):
     # sa_visit_t[:, :, i] = (discount ** i) * sa_visit
     sa_visit_t[:, :, i] = sa_visit
     # sum-out (SA)S
-    new_state_visitation = np.einsum('ij,ijk->k', sa_visit, t_matrix)
+    new_state_visitation = t_matrix.T.dot(sa_visit.reshape(-1))
     state_visitation = np.expand_dims(new_state_visitation, axis=1)
   return np.sum(sa_visit_t, axis=2) / float(env_time_limit)
 
@@ -96,7 +198,7 @@ def compute_occupancy(env, q_fn, ent_wt=1.0, env_time_limit=50, discount=1.0):
   state_visitation = np.zeros((dim_obs, 1))
   for (state, prob) in env.initial_state_distribution.items():
     state_visitation[state] = prob
-  t_matrix = env.transition_matrix()  # S x A x S
+  t_matrix = env.sparse_transition_matrix()  # SA x S
   sa_visit_t = np.zeros((dim_obs, dim_act, env_time_limit))
 
   for i in range(env_time_limit):
@@ -104,6 +206,6 @@ def compute_occupancy(env, q_fn, ent_wt=1.0, env_time_limit=50, discount=1.0):
     sa_visit_t[:, :, i] = (discount ** i) * sa_visit
     # sa_visit_t[:, :, i] = sa_visit
     # sum-out (SA)S
-    new_state_visitation = np.einsum('ij,ijk->k', sa_visit, t_matrix)
+    new_state_visitation = t_matrix.T.dot(sa_visit.reshape(-1))
     state_visitation = np.expand_dims(new_state_visitation, axis=1)
   return np.sum(sa_visit_t, axis=2) #/ float(env_time_limit)
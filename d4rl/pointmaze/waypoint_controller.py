@@ -1,5 +1,5 @@
 import numpy as np
-from d4rl.pointmaze import q_iteration
+from d4rl.pointmaze import maze_planner
 from d4rl.pointmaze.gridcraft import grid_env
 from d4rl.pointmaze.gridcraft import grid_spec
 
@@ -9,6 +9,17 @@ ONES = np.zeros((2,), dtype=np.float32)
 
 
 class WaypointController(object):
+    """
+    Drives a point mass through a maze to a target with a PD controller that
+    follows waypoints along a shortest path on the maze grid.
+
+    Paths are read from the maze's MazePlanner, which is shared by every
+    controller of the same maze, so a new target is not planned again.
+
+    Args:
+        maze_str (str): The maze layout.
+    """
+
     def __init__(self, maze_str, solve_thresh=0.1, p_gain=10.0, d_gain=-1.0):
         self.maze_str = maze_str
         self._target = -1000 * ONES
@@ -23,6 +34,7 @@ class WaypointController(object):
         self._waypoint_prev_loc = ZEROS
 
         self.env = grid_env.GridEnv(grid_spec.spec_from_string(maze_str))
+        self.planner = maze_planner.get_planner(maze_str)
 
     def current_waypoint(self):
         return self._waypoints[self._waypoint_idx]
@@ -59,39 +71,112 @@ class WaypointController(object):
     def gridify_state(self, state):
         return (int(round(state[0])), int(round(state[1])))
 
+    def _get_path(self, start, target):
+        """Returns the cells along a path from start to target as an L x 2 array."""
+        # The target is always the last waypoint, even when already there.
+        return np.array(self.planner.path(start, target) or [target], dtype=np.float64)
+
     def _new_target(self, start, target):
         #print('Computing waypoints from %s to %s' % (start, target))
         start = self.gridify_state(start)
-        start_idx = self.env.gs.xy_to_idx(start)
         target = self.gridify_state(target)
-        target_idx = self.env.gs.xy_to_idx(target)
         self._waypoint_idx = 0
 
-        self.env.gs[target] = grid_spec.REWARD
-        q_values = q_iteration.q_iteration(env=self.env, num_itrs=50, discount=0.99)
-        # compute waypoints by performing a rollout in the grid
-        max_ts = 100
-        s = start_idx
-        waypoints = []
-        for i in range(max_ts):
-            a = np.argmax(q_values[s])
-            new_s, reward = self.env.step_stateless(s, a)
-
-            waypoint = self.env.gs.idx_to_xy(new_s)
-            if new_s != target_idx:
-                waypoint = waypoint - np.random.uniform(size=(2,))*0.2
-            waypoints.append(waypoint)
-            s = new_s
-            if new_s == target_idx:
-                break
-        self.env.gs[target] = grid_spec.EMPTY
+        waypoints = self._get_path(start, target)
+        # Intermediate waypoints are jittered so that trajectories vary.
+        waypoints[:-1] -= np.random.uniform(size=(waypoints.shape[0] - 1, 2))*0.2
         self._waypoints = waypoints
         self._waypoint_prev_loc = start
         self._target = target
 
 
+class BatchedWaypointController(WaypointController):
+    """
+    A WaypointController for a batch of point masses in the same maze.
+
+    The waypoints of every agent are held in one padded array, so that the
+    actions and waypoint updates of all agents are computed with a few array
+    operations per step. Agent i behaves like its own WaypointController.
+
+    Example:
+        controller = BatchedWaypointController(maze_str, num_agents=len(envs))
+        obs = np.stack([env.reset() for env in envs])
+        targets = np.stack([env.get_target() for env in envs])
+        actions, done = controller.get_action(obs[:, 0:2], obs[:, 2:4], targets)
+
+    Args:
+        maze_str (str): The maze layout.
+        num_agents (int): Number of agents.
+    """
+
+    def __init__(self, maze_str, num_agents, solve_thresh=0.1, p_gain=10.0, d_gain=-1.0):
+        super(BatchedWaypointController, self).__init__(maze_str, solve_thresh=solve_thresh, p_gain=p_gain,
+                                                        d_gain=d_gain)
+        self.num_agents = num_agents
+        self._target = np.full((num_agents, 2), -1000.0)
+        self._waypoint_idx = np.zeros(num_agents, dtype=np.int64)
+        self._num_waypoints = np.ones(num_agents, dtype=np.int64)
+        self._waypoints = np.zeros((num_agents, 1, 2))
+        self._waypoint_prev_loc = np.zeros((num_agents, 2))
+
+    def current_waypoint(self):
+        return self._waypoints[np.arange(self.num_agents), self._waypoint_idx]
+
+    def get_action(self, location, velocity, target):
+        """
+        Computes the actions of every agent.
+
+        Args:
+            location: An N x 2 array of positions.
+            velocity: An N x 2 array of velocities.
+            target: An N x 2 array of target positions.
+
+        Returns:
+            An N x 2 array of actions, and an N dimensional boolean array
+            which is True for agents that have reached their target.
+        """
+        location = np.asarray(location, dtype=np.float64)
+        velocity = np.asarray(velocity, dtype=np.float64)
+        target_cells = np.round(np.asarray(target, dtype=np.float64))
+        changed = np.linalg.norm(self._target - target_cells, axis=1) > 1e-3
+        if changed.any():
+            self._new_targets(np.nonzero(changed)[0], location, target_cells)
+
+        dist = np.linalg.norm(location - self._target, axis=1)
+        vel_norm = np.linalg.norm(self._waypoint_prev_loc - location, axis=1)
+        task_not_solved = (dist >= self.solve_thresh) | (vel_norm >= self.vel_thresh)
+
+        next_wpnt = np.where(task_not_solved[:, None], self.current_waypoint(), self._target)
+        action = self.p_gain * (next_wpnt - location) + self.d_gain * velocity
+
+        dist_next_wpnt = np.linalg.norm(location - next_wpnt, axis=1)
+        advance = task_not_solved & (dist_next_wpnt < self.solve_thresh) & (vel_norm < self.vel_thresh)
+        self._waypoint_idx = np.minimum(self._waypoint_idx + advance, self._num_waypoints - 1)
+
+        self._waypoint_prev_loc = location.copy()
+        return np.clip(action, -1.0, 1.0), ~task_not_solved
+
+    def _new_targets(self, agents, location, target_cells):
+        starts = np.round(location[agents]).astype(np.int64)
+        targets = target_cells[agents].astype(np.int64)
+        paths = [self._get_path(tuple(start), tuple(target)) for start, target in zip(starts.tolist(), targets.tolist())]
+        max_len = max(path.shape[0] for path in paths)
+        if max_len > self._waypoints.shape[1]:
+            waypoints = np.zeros((self.num_agents, max_len, 2))
+            waypoints[:, :self._waypoints.shape[1]] = self._waypoints
+            self._waypoints = waypoints
+        for agent, waypoints in zip(agents, paths):
+            # Intermediate waypoints are jittered so that trajectories vary.
+            waypoints[:-1] -= np.random.uniform(size=(waypoints.shape[0] - 1, 2))*0.2
+            self._waypoints[agent, :waypoints.shape[0]] = waypoints
+            self._num_waypoints[agent] = waypoints.shape[0]
+        self._waypoint_idx[agents] = 0
+        self._waypoint_prev_loc[agents] = starts
+        self._target[agents] = targets
+
+
 if __name__ == "__main__":
-    print(q_iteration.__file__)
+    print(maze_planner.__file__)
     TEST_MAZE = \
             "######\\"+\
             "#OOOO#\\"+\
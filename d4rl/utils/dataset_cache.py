@@ -0,0 +1,225 @@
+"""
+Uncompressed on-disk copies of HDF5 datasets.
+
+Every key of the source file is written to its own .npy file so that it can be
+memory-mapped and paged in on access, instead of being decompressed into RAM
+every time the dataset is loaded. Virtual datasets which are a range of rows of
+another key, such as the virtual/* chunks of chunked datasets, are not copied
+but recorded as views of that key. Each copy records the fingerprint of the file it
+was made from, and is rebuilt when the source file changes.
+"""
+import json
+import os
+import shutil
+
+import h5py
+import numpy as np
+from tqdm import tqdm
+
+from d4rl.utils import filelock, parallel_read
+
+MANIFEST_NAME = 'manifest.json'
+
+# Upper bound on the number of bytes copied from the HDF5 file per step.
+COPY_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def cache_dir_from_h5path(h5path):
+    """Returns the directory holding the uncompressed copy of h5path."""
+    return os.path.splitext(h5path)[0] + '_npy'
+
+
+def _column_path(cache_dir, key):
+    return os.path.join(cache_dir, *(key.split('/'))) + '.npy'
+
+
+def _copy_rows(dset, out, num_workers=None):
+    """Copies an HDF5 dataset into out, a few chunks at a time."""
+    if num_workers is not None and parallel_read.supports_chunk_read(dset):
+        parallel_read.read_chunks(dset, out=out, num_workers=num_workers)
+        return
+    row_bytes = max(1, int(np.prod(dset.shape[1:], dtype=np.int64)) * dset.dtype.itemsize)
+    step = max(1, COPY_BLOCK_BYTES // row_bytes)
+    if dset.chunks is not None and step > dset.chunks[0]:
+        step -= step % dset.chunks[0]
+    for start in range(0, dset.shape[0], step):
+        stop = min(start + step, dset.shape[0])
+        dset.read_direct(out, np.s_[start:stop], np.s_[start:stop])
+
+
+def _virtual_rows(dataset_file, dset):
+    """
+    Returns (source key, start, stop) if dset is a virtual dataset holding rows
+    start to stop of another key of the same file, and None otherwise.
+    """
+    if not dset.is_virtual:
+        return None
+    sources = dset.virtual_sources()
+    if len(sources) != 1 or sources[0].file_name != '.':
+        return None
+    vspace, _, src_key, src_space = sources[0]
+    src_key = src_key.lstrip('/')
+    src = dataset_file.get(src_key)
+    if not isinstance(src, h5py.Dataset) or src.is_virtual or src.dtype != dset.dtype \
+            or src.shape[1:] != dset.shape[1:] or dset.size == 0:
+        return None
+    if vspace.get_select_npoints() != dset.size or src_space.get_select_npoints() != dset.size:
+        return None
+    (lo, hi) = src_space.get_select_bounds()
+    # A contiguous block of whole rows, mapped onto the virtual dataset in order.
+    if tuple(lo[1:]) != (0,) * (src.ndim - 1) or hi[0] - lo[0] + 1 != dset.shape[0]:
+        return None
+    return src_key, lo[0], hi[0] + 1
+
+
+def build_cache(h5path, cache_dir=None, source_checksum=None, num_workers=None):
+    """
+    Writes an uncompressed copy of every key in h5path to cache_dir.
+
+    The copy is assembled in a temporary directory and renamed into place once
+    complete, so a partially written cache is never picked up by load_cache.
+
+    Args:
+        h5path (str): Path to the source HDF5 file.
+        cache_dir (str): Destination directory. Defaults to
+            cache_dir_from_h5path(h5path).
+        source_checksum (str): Fingerprint of h5path, recorded in the manifest
+            so that the copy can be validated against the source later.
+        num_workers (int): If set, compressed keys are inflated with this
+            many threads, see d4rl.utils.parallel_read.
+
+    Returns:
+        The path to the cache directory.
+    """
+    if cache_dir is None:
+        cache_dir = cache_dir_from_h5path(h5path)
+    tmp_dir = '%s.tmp%d' % (cache_dir, os.getpid())
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    from d4rl.offline_env import get_keys
+
+    manifest = {'source_checksum': source_checksum, 'keys': {}}
+    with h5py.File(h5path, 'r') as dataset_file:
+        for k in tqdm(get_keys(dataset_file), desc="uncompress datafile"):
+            dset = dataset_file[k]
+            view = _virtual_rows(dataset_file, dset)
+            if view is not None:
+                src_key, start, stop = view
+                manifest['keys'][k] = {'shape': list(dset.shape), 'dtype': dset.dtype.str, 'mmap': True,
+                                       'view': src_key, 'start': start, 'stop': stop}
+                continue
+            path = _column_path(tmp_dir, k)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Scalars and variable-length entries cannot be memory-mapped,
+            # they are small and get loaded eagerly instead.
+            mmap = dset.shape != () and dset.dtype.kind != 'O' and dset.size > 0
+            if mmap:
+                out = np.lib.format.open_memmap(path, mode='w+', dtype=dset.dtype, shape=dset.shape)
+                _copy_rows(dset, out, num_workers=num_workers)
+                out.flush()
+                del out
+            else:
+                np.save(path, np.asarray(dset[()]), allow_pickle=True)
+            manifest['keys'][k] = {'shape': list(dset.shape), 'dtype': dset.dtype.str, 'mmap': mmap}
+
+    # The manifest is written last and marks the copy as complete.
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    try:
+        os.rename(tmp_dir, cache_dir)
+    except OSError:
+        # Another process finished the same copy first.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(cache_dir, MANIFEST_NAME)):
+            raise
+    return cache_dir
+
+
+def cached_keys(cache_dir):
+    """Returns the keys stored in a cache directory."""
+    return list(_read_manifest(cache_dir)['keys'])
+
+
+def load_cache(cache_dir, mmap=True, keys=None):
+    """
+    Loads an uncompressed copy written by build_cache.
+
+    Args:
+        cache_dir (str): Directory produced by build_cache.
+        mmap (bool): If True, array columns are returned as read-only
+            memory-mapped arrays. Otherwise they are read into memory.
+        keys (list): Keys to load. Defaults to all keys.
+
+    Returns:
+        A dictionary in the same format as OfflineEnv.get_dataset().
+    """
+    with open(os.path.join(cache_dir, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+
+    data_dict = {}
+    for k, info in manifest['keys'].items():
+        if keys is not None and k not in keys:
+            continue
+        if 'view' in info:
+            value = np.load(_column_path(cache_dir, info['view']), mmap_mode='r')[info['start']:info['stop']]
+            data_dict[k] = value if mmap else np.array(value)
+            continue
+        path = _column_path(cache_dir, k)
+        if info['mmap']:
+            data_dict[k] = np.load(path, mmap_mode='r' if mmap else None)
+        else:
+            value = np.load(path, allow_pickle=True)
+            data_dict[k] = value[()] if value.shape == () else value
+    return data_dict
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_cache(cache_dir):
+    """Deletes a cache directory, moving it out of the way first."""
+    if not os.path.exists(cache_dir):
+        return
+    stale_dir = '%s.stale%d' % (cache_dir, os.getpid())
+    os.rename(cache_dir, stale_dir)
+    shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def load_or_build_cache(h5path, source_checksum, mmap=True, num_workers=None, select_keys=None):
+    """
+    Loads the uncompressed copy of h5path, creating it on first use.
+
+    The copy is rebuilt if it was made from a different version of the
+    source file. Processes loading the same file concurrently wait for the
+    one that builds the copy.
+
+    Args:
+        h5path (str): Path to the source HDF5 file.
+        source_checksum (str): Current fingerprint of h5path, see
+            d4rl.offline_env.file_fingerprint.
+        mmap (bool): Whether to memory-map the columns, see load_cache.
+        num_workers (int): Decompression threads used if the copy is built.
+        select_keys: An optional function mapping the list of stored keys
+            to the keys that should be loaded.
+
+    Returns:
+        A dictionary in the same format as OfflineEnv.get_dataset().
+    """
+    cache_dir = cache_dir_from_h5path(h5path)
+
+    def is_valid():
+        manifest = _read_manifest(cache_dir)
+        return manifest is not None and manifest.get('source_checksum') == source_checksum
+
+    if not is_valid():
+        with filelock.FileLock(cache_dir + '.lock'):
+            if not is_valid():
+                remove_cache(cache_dir)
+                build_cache(h5path, cache_dir, source_checksum=source_checksum, num_workers=num_workers)
+    keys = None if select_keys is None else select_keys(cached_keys(cache_dir))
+    return load_cache(cache_dir, mmap=mmap, keys=keys)
@@ -53,3 +53,322 @@ class DatasetWriter(object):
             dataset.create_dataset(k, data=np_data[k], compression=compression)
         dataset.close()
 
+
+
+def infer_timeouts(terminals, max_episode_steps, restart_step=1, start_step=0, return_step=False):
+    """
+    Reconstructs episode timeouts for datasets without a timeouts field.
+
+    Older datasets only store terminals, so time limits are recovered by
+    counting steps since the last episode end. This reproduces the step counter
+    used by d4rl.qlearning_dataset and d4rl.sequence_dataset: the counter
+    restarts at 1 after a terminal and at restart_step after a timeout.
+    Only one Python iteration is needed per episode.
+
+    Args:
+        terminals: An N-dim boolean array of terminal flags.
+        max_episode_steps (int): The environment time limit.
+        restart_step (int): Value of the step counter after a timeout.
+        start_step (int): Value of the step counter on the first step, when
+            terminals are a window of a larger dataset.
+        return_step (bool): If True, also return the value of the step
+            counter after the last step, to continue counting in the next
+            window.
+
+    Returns:
+        An N-dim boolean array which is True on the last step of each
+        episode that ended due to the time limit, and the final value of the
+        step counter if return_step is True.
+    """
+    N = terminals.shape[0]
+    timeouts = np.zeros(N, dtype=np.bool_)
+    terminal_idxs = np.flatnonzero(terminals)
+    i, episode_step = 0, start_step
+    while i < N:
+        j = np.searchsorted(terminal_idxs, i)
+        next_terminal = terminal_idxs[j] if j < terminal_idxs.shape[0] else N
+        if episode_step > max_episode_steps - 1:
+            # The counter has already passed the time limit and never matches it again.
+            next_timeout = N
+        else:
+            next_timeout = i + (max_episode_steps - 1 - episode_step)
+        if next_terminal < min(next_timeout, N):
+            i, episode_step = next_terminal + 1, 1
+        elif next_timeout < N:
+            timeouts[next_timeout] = True
+            i, episode_step = next_timeout + 1, restart_step
+        else:
+            break
+    if return_step:
+        return timeouts, episode_step + (N - i)
+    return timeouts
+
+
+def episode_boundaries(terminals, timeouts):
+    """
+    Computes where episodes start and end.
+
+    An episode ends on any step flagged as terminal or timeout. Steps after
+    the last such flag belong to an unfinished episode and are not included.
+
+    Args:
+        terminals: An N-dim boolean array of terminal flags.
+        timeouts: An N-dim boolean array of timeout flags.
+
+    Returns:
+        A tuple (starts, lengths) of int64 arrays with one entry per episode.
+    """
+    ends = np.flatnonzero(np.logical_or(terminals, timeouts))
+    starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+    lengths = ends + 1 - starts
+    return starts, lengths
+
+
+def episode_index(rewards, terminals, timeouts):
+    """
+    Summarizes every complete episode of a dataset.
+
+    Args:
+        rewards: An N-dim array of rewards.
+        terminals: An N-dim boolean array of terminal flags.
+        timeouts: An N-dim boolean array of timeout flags.
+
+    Returns:
+        A dictionary of arrays with one entry per episode:
+            starts: Index of the first step of the episode.
+            lengths: Number of steps in the episode.
+            returns: Undiscounted sum of rewards.
+            terminals: True if the episode ended in a terminal state,
+                False if it ended due to a timeout.
+    """
+    rewards = np.asarray(rewards).reshape(-1)
+    terminals = np.asarray(terminals, dtype=np.bool_).reshape(-1)
+    starts, lengths = episode_boundaries(terminals, np.asarray(timeouts, dtype=np.bool_).reshape(-1))
+    ends = starts + lengths - 1
+    if starts.shape[0] > 0:
+        returns = np.add.reduceat(rewards[:ends[-1]+1], starts, dtype=np.float64)
+    else:
+        returns = np.zeros(0, dtype=np.float64)
+    return {
+        'starts': starts,
+        'lengths': lengths,
+        'returns': returns,
+        'terminals': terminals[ends],
+    }
+
+
+def shard_boundaries(starts, num_rows, num_shards):
+    """
+    Splits a dataset into contiguous shards of roughly equal size which
+    begin and end on episode boundaries.
+
+    Args:
+        starts: Sorted start offsets of all episodes.
+        num_rows (int): Total number of rows in the dataset.
+        num_shards (int): Number of shards.
+
+    Returns:
+        An array of num_shards + 1 row offsets. Shard i covers rows
+        boundaries[i] to boundaries[i+1].
+    """
+    targets = np.arange(1, num_shards) * num_rows / float(num_shards)
+    cut_points = np.append(starts, num_rows)
+    # Move each cut to the nearest episode start.
+    idxs = np.clip(np.searchsorted(cut_points, targets), 1, cut_points.shape[0] - 1)
+    before, after = cut_points[idxs - 1], cut_points[idxs]
+    cuts = np.where(targets - before <= after - targets, before, after)
+    return np.concatenate([[0], cuts, [num_rows]]).astype(np.int64)
+
+
+def episode_rows(starts, lengths):
+    """
+    Lists the rows covered by a set of episodes.
+
+    Args:
+        starts: Start offsets of the episodes.
+        lengths: Lengths of the episodes.
+
+    Returns:
+        A tuple (rows, timesteps) of int64 arrays with one entry per step of
+        every episode, in order: the index of the step in the dataset and its
+        position within its episode.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    timesteps = np.arange(lengths.sum(), dtype=np.int64) - np.repeat(offsets, lengths)
+    return np.repeat(starts, lengths) + timesteps, timesteps
+
+
+def _discounted_suffix_sums(values, dist, discount):
+    """
+    Computes values[t] + discount * values[t+1] + ... + discount^dist[t] * values[t+dist[t]]
+    for every t, where dist[t] is the distance from t to the end of its segment.
+
+    Each pass doubles the number of terms covered, so only log2(max(dist))
+    vectorized passes are needed.
+    """
+    sums = np.asarray(values, dtype=np.float64).copy()
+    stride, scale = 1, float(discount)
+    max_dist = dist.max() if dist.shape[0] > 0 else 0
+    while stride <= max_dist:
+        rows = np.flatnonzero(dist >= stride)
+        sums[rows] += scale * sums[rows + stride]
+        stride, scale = 2 * stride, scale * scale
+    return sums
+
+
+def returns_to_go(rewards, starts, lengths, discount=1.0):
+    """
+    Computes the discounted sum of rewards from every step to the end of
+    its episode.
+
+    Args:
+        rewards: An N-dim array of rewards.
+        starts: Start offsets of the episodes.
+        lengths: Lengths of the episodes.
+        discount (float): Discount factor.
+
+    Returns:
+        An N-dim float64 array. Steps which are not part of any of the
+        episodes are set to 0.
+    """
+    rewards = np.asarray(rewards).reshape(-1)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    rtg = np.zeros(rewards.shape[0], dtype=np.float64)
+    rows, timesteps = episode_rows(starts, lengths)
+    dist = np.repeat(lengths, lengths) - 1 - timesteps
+    rtg[rows] = _discounted_suffix_sums(rewards[rows], dist, discount)
+    return rtg
+
+
+def nstep_targets(rewards, terminals, timeouts, discount, n_step=1):
+    """
+    Computes discounted returns-to-go and n-step bootstrapped targets for
+    every step of a dataset.
+
+    Terminals and timeouts are treated as in d4rl.qlearning_dataset: an
+    episode ending in a terminal state is never bootstrapped past its last
+    step, while an episode cut short by a timeout is bootstrapped from its
+    last observation. The last step of such an episode, and the last step of
+    the dataset, have no next observation and are marked invalid; the valid
+    steps are exactly the transitions kept by d4rl.qlearning_dataset, so
+
+        targets['nstep_returns'][targets['valid']]
+
+    lines up with its output. The n-step target of a valid step t is
+
+        nstep_returns[t] + nstep_discounts[t] * V(observations[nstep_next_index[t]])
+
+    Args:
+        rewards: An N-dim array of rewards.
+        terminals: An N-dim boolean array of terminal flags.
+        timeouts: An N-dim boolean array of timeout flags.
+        discount (float): Discount factor.
+        n_step (int): Maximum number of rewards summed before bootstrapping.
+
+    Returns:
+        A dictionary of N-dim arrays:
+            returns_to_go: Discounted sum of rewards to the end of the episode.
+            nstep_returns: Discounted sum of the next n_step rewards, or fewer
+                if the episode ends first.
+            nstep_discounts: Discount applied to the bootstrapped value; 0 if
+                the episode terminates within n_step steps.
+            nstep_next_index: Index of the observation to bootstrap from.
+            valid: False for steps without a next observation.
+    """
+    if n_step < 1:
+        raise ValueError('n_step must be at least 1, got %d' % n_step)
+    rewards = np.asarray(rewards).reshape(-1)
+    terminals = np.asarray(terminals, dtype=np.bool_).reshape(-1)
+    timeouts = np.asarray(timeouts, dtype=np.bool_).reshape(-1)
+    N = rewards.shape[0]
+
+    # Steps after the last episode end form an unfinished episode, which is
+    # bootstrapped like one that timed out.
+    ends = np.flatnonzero(np.logical_or(terminals, timeouts))
+    if ends.shape[0] == 0 or ends[-1] != N - 1:
+        ends = np.append(ends, N - 1)
+    steps = np.arange(N, dtype=np.int64)
+    episode_end = ends[np.searchsorted(ends, steps)]
+    dist = episode_end - steps
+    terminated = terminals[episode_end]
+
+    rtg = _discounted_suffix_sums(rewards, dist, discount)
+    # Episodes that terminate within n_step steps are summed to the end and
+    # not bootstrapped. Others are bootstrapped from at most n_step steps
+    # ahead, and never past the last observation of their episode.
+    truncated = np.logical_and(terminated, dist < n_step)
+    horizon = np.where(truncated, dist + 1, np.minimum(n_step, dist))
+    # The index is unused when truncated, but stays in bounds.
+    next_index = np.minimum(steps + horizon, max(N - 1, 0))
+    scale = np.power(float(discount), horizon)
+    nstep_returns = rtg - np.where(truncated, 0., scale * rtg[next_index])
+
+    valid = ~timeouts
+    valid[-1:] = False
+    return {
+        'returns_to_go': rtg.astype(np.float32),
+        'nstep_returns': nstep_returns.astype(np.float32),
+        'nstep_discounts': np.where(truncated, 0., scale).astype(np.float32),
+        'nstep_next_index': next_index,
+        'valid': valid,
+    }
+
+
+class IndexedColumn(object):
+    """
+    A read-only column whose rows are rows of another array, selected by an
+    index: column[i] is data[index[i]]. Rows are only gathered when they are
+    accessed, so the column takes no memory beyond the index.
+
+    Indexing, len(), shape, dtype, np.take and np.asarray behave as they do
+    for the equivalent array data[index].
+
+    Args:
+        data: The array holding the rows.
+        index: An integer array of row numbers into data.
+    """
+
+    def __init__(self, data, index):
+        self.data = data
+        self.index = index
+
+    @property
+    def shape(self):
+        return self.index.shape + tuple(self.data.shape[1:])
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.index.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            return self.data[(self.index[key[0]],) + key[1:]]
+        return self.data[self.index[key]]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.data[self.index]
+        return array if dtype is None else array.astype(dtype)
+
+    def take(self, indices, axis=0, out=None, mode='raise'):
+        if axis != 0:
+            return np.take(np.asarray(self), indices, axis=axis, out=out, mode=mode)
+        return np.take(self.data, self.index[indices], axis=0, out=out, mode=mode)
+
+    def astype(self, dtype):
+        return np.asarray(self, dtype=dtype)
+
+    def __repr__(self):
+        return 'IndexedColumn(shape=%s, dtype=%s)' % (self.shape, self.dtype)
@@ -0,0 +1,211 @@
+"""
+Resumable, verified downloads of dataset files.
+
+Files are downloaded into <filepath>.part and only renamed to filepath once
+their size and checksum have been verified, so an interrupted download never
+leaves a truncated file behind. When the server supports HTTP Range requests,
+large files are fetched as several byte ranges in parallel, and the progress of
+each range is recorded in <filepath>.part.json so that a killed download
+resumes where it stopped.
+"""
+import concurrent.futures
+import hashlib
+import http.client
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+from tqdm import tqdm
+
+BLOCK_SIZE = 1 << 20
+
+# Files smaller than this are downloaded over a single connection.
+MIN_SPLIT_SIZE = 64 * 1024 * 1024
+
+# Range progress is saved to disk after this many bytes have been written.
+STATE_SAVE_INTERVAL = 16 * BLOCK_SIZE
+
+
+def _probe(url, timeout):
+    """Returns the size of a remote file and whether it supports Range requests."""
+    request = urllib.request.Request(url, method='HEAD')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            size = response.headers.get('Content-Length')
+            accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+            return (int(size) if size is not None else None), accepts_ranges
+    except urllib.error.HTTPError:
+        # Some servers do not implement HEAD.
+        return None, False
+
+
+def _sha256(filepath):
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _split(size, num_connections):
+    num_ranges = num_connections if size >= MIN_SPLIT_SIZE else 1
+    bounds = [size * i // num_ranges for i in range(num_ranges + 1)]
+    return [{'start': bounds[i], 'end': bounds[i+1], 'pos': bounds[i]} for i in range(num_ranges)]
+
+
+class _RangeState(object):
+    """Tracks the byte ranges of a download and saves them for resuming."""
+
+    def __init__(self, state_path, url, size, num_connections):
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.ranges = None
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            if state['url'] == url and state['size'] == size:
+                self.ranges = state['ranges']
+        except (OSError, ValueError, KeyError):
+            pass
+        if self.ranges is None:
+            self.ranges = _split(size, num_connections)
+        self.url = url
+        self.size = size
+        self._unsaved = 0
+
+    @property
+    def downloaded(self):
+        return sum(r['pos'] - r['start'] for r in self.ranges)
+
+    def advance(self, r, nbytes):
+        with self.lock:
+            r['pos'] += nbytes
+            self._unsaved += nbytes
+            if self._unsaved >= STATE_SAVE_INTERVAL:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'url': self.url, 'size': self.size, 'ranges': self.ranges}, f)
+        os.replace(tmp_path, self.state_path)
+        self._unsaved = 0
+
+
+def _download_range(url, part_path, r, state, progress, timeout):
+    if r['pos'] >= r['end']:
+        return
+    request = urllib.request.Request(url, headers={'Range': 'bytes=%d-%d' % (r['pos'], r['end'] - 1)})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206:
+            raise IOError('Server ignored Range request for %s' % url)
+        with open(part_path, 'r+b') as f:
+            f.seek(r['pos'])
+            while r['pos'] < r['end']:
+                block = response.read(min(BLOCK_SIZE, r['end'] - r['pos']))
+                if not block:
+                    raise IOError('Connection closed early while downloading %s' % url)
+                f.write(block)
+                # The state is only advanced once the bytes are on disk.
+                f.flush()
+                state.advance(r, len(block))
+                progress.update(len(block))
+
+
+def _download_ranges(url, part_path, size, num_connections, progress, timeout):
+    state = _RangeState(part_path + '.json', url, size, num_connections)
+    if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+        state.ranges = _split(size, num_connections)
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+    progress.update(state.downloaded)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(state.ranges)) as pool:
+            futures = [pool.submit(_download_range, url, part_path, r, state, progress, timeout)
+                       for r in state.ranges]
+            for future in futures:
+                future.result()
+    finally:
+        state.save()
+
+
+def _download_stream(url, part_path, size, progress, timeout):
+    written = 0
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        with open(part_path, 'wb') as f:
+            for block in iter(lambda: response.read(BLOCK_SIZE), b''):
+                f.write(block)
+                written += len(block)
+                progress.update(len(block))
+    if size is not None and written != size:
+        # Without Range support, the download is retried from the start.
+        raise IOError('Connection closed early while downloading %s' % url)
+
+
+def download(url, filepath, size=None, sha256=None, num_connections=4, retries=3, timeout=60,
+             show_progress=True):
+    """
+    Downloads url to filepath.
+
+    Args:
+        url (str): The URL to download.
+        filepath (str): Destination path. Nothing is written to it until the
+            download has completed and been verified.
+        size (int): Expected size in bytes, if known.
+        sha256 (str): Expected SHA-256 checksum as a hex string, if known.
+        num_connections (int): Number of byte ranges downloaded in parallel
+            for large files.
+        retries (int): Number of times a failed transfer is retried. Range
+            downloads resume from where they stopped.
+        timeout (float): Socket timeout in seconds.
+        show_progress (bool): Whether to display a progress bar.
+
+    Returns:
+        The SHA-256 checksum of the downloaded file if it was verified,
+        otherwise None.
+    """
+    part_path = filepath + '.part'
+    state_path = part_path + '.json'
+
+    remote_size, accepts_ranges = _probe(url, timeout)
+    if size is not None and remote_size is not None and size != remote_size:
+        raise IOError('Size of %s is %d bytes, expected %d' % (url, remote_size, size))
+    if remote_size is None:
+        remote_size = size
+
+    for attempt in range(retries + 1):
+        try:
+            with tqdm(total=remote_size, unit='B', unit_scale=True, desc=os.path.basename(filepath),
+                      disable=not show_progress) as progress:
+                if remote_size is not None and accepts_ranges:
+                    _download_ranges(url, part_path, remote_size, num_connections, progress, timeout)
+                else:
+                    _download_stream(url, part_path, remote_size, progress, timeout)
+            break
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == retries:
+                raise
+            print('Download of %s failed (%s), retrying' % (url, e))
+
+    actual_size = os.path.getsize(part_path)
+    if remote_size is not None and actual_size != remote_size:
+        raise IOError('Downloaded %d bytes from %s, expected %d' % (actual_size, url, remote_size))
+    checksum = None
+    if sha256 is not None:
+        checksum = _sha256(part_path)
+        if checksum != sha256.lower():
+            os.remove(part_path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            raise IOError('Checksum mismatch for %s: got %s, expected %s' % (url, checksum, sha256))
+
+    os.replace(part_path, filepath)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return checksum
@@ -0,0 +1,167 @@
+"""
+Exclusive locks shared between processes, including processes on different
+hosts that share a dataset directory over NFS.
+"""
+import errno
+import os
+import socket
+import threading
+import time
+import uuid
+import warnings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# fcntl locks are held per process, so threads of the same process are
+# serialized with an ordinary lock per path as well.
+_THREAD_LOCKS = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _thread_lock(path):
+    with _THREAD_LOCKS_GUARD:
+        return _THREAD_LOCKS.setdefault(os.path.abspath(path), threading.Lock())
+
+
+class FileLock(object):
+    """
+    A lock on a file path, for use as a context manager.
+
+    POSIX record locks (fcntl.lockf) are used where available. Unlike flock,
+    these are forwarded to the server by NFS clients. On filesystems that do
+    not support them, the lock is instead taken by atomically creating
+    <path>.owner. Its owner refreshes the file's modification time while
+    holding the lock, so that the lock of a crashed process is broken once it
+    has not been refreshed for stale_after seconds.
+
+    Args:
+        path (str): Path of the lock file.
+        timeout (float): Seconds to wait for the lock before raising
+            TimeoutError. Waits forever by default.
+        poll_interval (float): Seconds between attempts to take the lock.
+        stale_after (float): Age in seconds after which an .owner file is
+            considered abandoned.
+    """
+
+    def __init__(self, path, timeout=None, poll_interval=0.5, stale_after=120.0):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._use_fcntl = fcntl is not None
+        self._fd = None
+        self._owner_path = None
+        self._heartbeat = None
+        self._released = threading.Event()
+        self._thread_lock = _thread_lock(path)
+
+    def acquire(self):
+        start = time.time()
+        if not self._thread_lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            raise TimeoutError('Timed out waiting for lock %s' % self.path)
+        try:
+            announced = False
+            while not self._try_acquire():
+                if not announced:
+                    print('Waiting for another process holding', self.path)
+                    announced = True
+                if self.timeout is not None and time.time() - start > self.timeout:
+                    raise TimeoutError('Timed out waiting for lock %s' % self.path)
+                time.sleep(self.poll_interval)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+            if self._owner_path is not None:
+                self._released.set()
+                self._heartbeat.join()
+                try:
+                    os.remove(self._owner_path)
+                except FileNotFoundError:
+                    pass
+                self._owner_path = None
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _try_acquire(self):
+        if self._use_fcntl:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return True
+            except OSError as e:
+                os.close(fd)
+                if e.errno in (errno.EACCES, errno.EAGAIN):
+                    return False
+                if e.errno not in (errno.ENOLCK, errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                    raise
+                # The filesystem does not support record locks.
+                self._use_fcntl = False
+        return self._try_acquire_owner_file()
+
+    def _try_acquire_owner_file(self):
+        owner_path = self.path + '.owner'
+        try:
+            fd = os.open(owner_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            try:
+                age = time.time() - os.stat(owner_path).st_mtime
+            except FileNotFoundError:
+                return False
+            if age > self.stale_after:
+                self._break_stale_owner_file(owner_path)
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write('%s:%d\n' % (socket.gethostname(), os.getpid()))
+        self._owner_path = owner_path
+        self._released.clear()
+        self._heartbeat = threading.Thread(target=self._refresh_owner_file, daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def _break_stale_owner_file(self, owner_path):
+        # Another process may replace the stale file between the stat and the
+        # removal, so the file is first renamed to a name of our own, which is
+        # atomic, and its age is checked again before it is deleted.
+        stale_path = '%s.stale-%s' % (owner_path, uuid.uuid4().hex)
+        try:
+            os.rename(owner_path, stale_path)
+        except FileNotFoundError:
+            return
+        if time.time() - os.stat(stale_path).st_mtime > self.stale_after:
+            warnings.warn('Breaking stale lock %s' % owner_path)
+            os.remove(stale_path)
+            return
+        # The file was taken over or refreshed by a live owner, put it back.
+        try:
+            os.link(stale_path, owner_path)
+        except FileExistsError:
+            pass
+        except OSError:  # no hard links on this filesystem
+            os.rename(stale_path, owner_path)
+            return
+        os.remove(stale_path)
+
+    def _refresh_owner_file(self):
+        while not self._released.wait(self.stale_after / 4):
+            try:
+                os.utime(self._owner_path)
+            except OSError:
+                pass
@@ -0,0 +1,274 @@
+"""
+Minibatch samplers over d4rl datasets.
+"""
+import queue
+import threading
+
+import numpy as np
+
+from d4rl.utils.dataset_utils import episode_boundaries, episode_rows, returns_to_go
+
+
+def _per_step_keys(dataset, num_rows):
+    return [k for k, v in dataset.items()
+            if hasattr(v, 'shape') and len(v.shape) > 0 and v.shape[0] == num_rows]
+
+
+class MinibatchSampler(object):
+    """
+    Samples uniform minibatches of transitions from a dataset.
+
+    Batches are gathered into preallocated buffers, optionally on a background
+    thread which keeps the next `prefetch` batches ready while the caller is
+    busy with the current one. Datasets may hold regular arrays or the
+    read-only memory-mapped arrays returned by get_dataset(lazy=True); for the
+    latter, the indices of each batch are sorted so that pages are read in
+    order.
+
+    The arrays of a batch are reused: they are overwritten once the next batch
+    is requested. Copy them to keep them around for longer.
+
+    Example:
+        sampler = MinibatchSampler(d4rl.qlearning_dataset(env), batch_size=256)
+        for _ in range(num_steps):
+            batch = sampler.sample()
+        sampler.close()
+
+    Args:
+        dataset: A dictionary of arrays, such as the output of
+            d4rl.qlearning_dataset().
+        batch_size (int): Number of transitions per batch.
+        keys (list): Keys to include in each batch. Defaults to every key
+            with one entry per transition.
+        seed (int): Seed for the random indices. Batches are reproducible for
+            a given seed, with or without prefetching.
+        prefetch (int): Number of batches prepared ahead of time on a
+            background thread. 0 gathers each batch on the calling thread.
+        replace (bool): If True, every index is drawn uniformly and
+            independently. If False, the dataset is sampled in epochs: each
+            epoch is a random permutation of all transitions cut into
+            consecutive batches, so that every transition is used exactly
+            once per epoch. A batch which does not fit into what is left of
+            an epoch is completed from the next one.
+    """
+
+    def __init__(self, dataset, batch_size, keys=None, seed=None, prefetch=2, replace=True):
+        if 'rewards' in dataset:
+            num_rows = dataset['rewards'].shape[0]
+        else:
+            num_rows = next(v.shape[0] for v in dataset.values() if hasattr(v, 'shape') and len(v.shape) > 0)
+        if keys is None:
+            keys = _per_step_keys(dataset, num_rows)
+        for k in keys:
+            if dataset[k].shape[0] != num_rows:
+                raise ValueError('Key %s has %d entries, expected %d' % (k, dataset[k].shape[0], num_rows))
+        if num_rows == 0:
+            raise ValueError('Cannot sample from an empty dataset')
+        if prefetch < 0:
+            raise ValueError('prefetch must be non-negative, got %d' % prefetch)
+
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.keys = list(keys)
+        self.num_rows = num_rows
+        self.prefetch = prefetch
+        self.replace = replace
+        self._rng = np.random.RandomState(seed)
+        self._epoch = np.empty(0, dtype=np.int64)
+        self._epoch_pos = 0
+        self._sort_indices = any(isinstance(dataset[k], np.memmap) for k in self.keys)
+
+        # One buffer is held by the caller while the others are being filled.
+        self._buffers = [self._allocate() for _ in range(prefetch + 1)]
+        self._current = None
+        self._closed = False
+        if prefetch > 0:
+            self._free = queue.Queue()
+            self._ready = queue.Queue()
+            for buf in self._buffers:
+                self._free.put(buf)
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+    def _allocate(self):
+        return {k: np.empty((self.batch_size,) + tuple(self.dataset[k].shape[1:]), dtype=self.dataset[k].dtype)
+                for k in self.keys}
+
+    def _draw(self, population):
+        """Returns batch_size random indices below population."""
+        if self.replace:
+            return self._rng.randint(0, population, size=self.batch_size)
+        idxs = np.empty(self.batch_size, dtype=np.int64)
+        filled = 0
+        while filled < self.batch_size:
+            if self._epoch_pos == self._epoch.shape[0]:
+                self._epoch = self._rng.permutation(population)
+                self._epoch_pos = 0
+            count = min(self.batch_size - filled, population - self._epoch_pos)
+            idxs[filled:filled + count] = self._epoch[self._epoch_pos:self._epoch_pos + count]
+            self._epoch_pos += count
+            filled += count
+        return idxs
+
+    def _sample_indices(self):
+        idxs = self._draw(self.num_rows)
+        if self._sort_indices:
+            idxs.sort()
+        return idxs
+
+    def _gather(self, idxs, buf):
+        for k in self.keys:
+            np.take(self.dataset[k], idxs, axis=0, out=buf[k])
+        return buf
+
+    def _worker(self):
+        while True:
+            buf = self._free.get()
+            if buf is None:
+                return
+            try:
+                self._ready.put(self._gather(self._sample_indices(), buf))
+            except Exception as e:
+                self._ready.put(e)
+                return
+
+    def sample(self):
+        """
+        Returns the next batch as a dictionary of arrays with batch_size rows.
+        """
+        if self._closed:
+            raise ValueError('Sampler is closed')
+        if self.prefetch == 0:
+            return self._gather(self._sample_indices(), self._buffers[0])
+        if self._current is not None:
+            self._free.put(self._current)
+            self._current = None
+        batch = self._ready.get()
+        if isinstance(batch, Exception):
+            self.close()
+            raise batch
+        self._current = batch
+        return batch
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.sample()
+
+    def close(self):
+        """Stops the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.prefetch > 0:
+            self._free.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TrajectorySampler(MinibatchSampler):
+    """
+    Samples batches of fixed-length windows of consecutive steps, for
+    training sequence models such as decision transformers.
+
+    Windows never cross episode boundaries. The start index of every valid
+    window is computed once, and each batch is then gathered with a single
+    vectorized lookup per key. Every batch holds the selected keys with shape
+    (batch_size, seq_len, ...), along with:
+        returns_to_go: The undiscounted sum of rewards from each step to the
+            end of its episode.
+        timesteps: The position of each step within its episode.
+        mask: False for padding.
+
+    Example:
+        sampler = TrajectorySampler(env.get_dataset(), seq_len=20,
+                                    batch_size=64, episodes=env.get_episode_index())
+        batch = sampler.sample()
+
+    Args:
+        dataset: A dictionary of arrays, such as the output of
+            env.get_dataset().
+        seq_len (int): Number of steps per window.
+        batch_size (int): Number of windows per batch.
+        keys (list): Keys to include in each batch. Defaults to every key
+            with one entry per step.
+        episodes: An optional episode index, as returned by
+            env.get_episode_index(). By default episodes are found from the
+            terminals and timeouts of the dataset.
+        pad (str): Padding policy. With None, only windows which lie fully
+            inside an episode are sampled, so episodes shorter than seq_len
+            are never used. With 'left' or 'right', a window may start at any
+            step and is cut short at the end of its episode; the missing
+            steps are filled with zeros on the given side.
+        seed (int): Seed for the random windows.
+        prefetch (int): Number of batches prepared ahead of time on a
+            background thread.
+        replace (bool): If False, windows are sampled in epochs, see
+            MinibatchSampler.
+    """
+
+    def __init__(self, dataset, seq_len, batch_size, keys=None, episodes=None, pad=None, seed=None,
+                 prefetch=2, replace=True):
+        if pad not in (None, 'left', 'right'):
+            raise ValueError('Unknown padding policy %s' % pad)
+        if episodes is None:
+            if 'timeouts' not in dataset:
+                raise ValueError('Dataset has no timeouts; pass its episode index with episodes=...')
+            starts, lengths = episode_boundaries(dataset['terminals'], dataset['timeouts'])
+        else:
+            starts, lengths = episodes['starts'], episodes['lengths']
+        num_rows = dataset['rewards'].shape[0]
+        if keys is None:
+            keys = _per_step_keys(dataset, num_rows)
+        columns = {k: dataset[k] for k in keys}
+        columns['returns_to_go'] = returns_to_go(dataset['rewards'], starts, lengths).astype(np.float32)
+        rows, timesteps = episode_rows(starts, lengths)
+        columns['timesteps'] = np.zeros(num_rows, dtype=np.int64)
+        columns['timesteps'][rows] = timesteps
+
+        ends = np.repeat(np.asarray(starts) + lengths, lengths)
+        if pad is None:
+            valid = ends - rows >= seq_len
+            rows, ends = rows[valid], ends[valid]
+        if rows.shape[0] == 0:
+            raise ValueError('No episode has at least %d steps' % seq_len)
+
+        self.seq_len = seq_len
+        self.pad = pad
+        self.window_starts = rows
+        self.window_lengths = np.minimum(ends - rows, seq_len)
+        super(TrajectorySampler, self).__init__(columns, batch_size, keys=list(columns), seed=seed,
+                                                prefetch=prefetch, replace=replace)
+
+    def _allocate(self):
+        buf = {k: np.empty((self.batch_size, self.seq_len) + tuple(self.dataset[k].shape[1:]),
+                           dtype=self.dataset[k].dtype)
+               for k in self.keys}
+        buf['mask'] = np.empty((self.batch_size, self.seq_len), dtype=np.bool_)
+        return buf
+
+    def _sample_indices(self):
+        return self._draw(self.window_starts.shape[0])
+
+    def _gather(self, windows, buf):
+        starts = self.window_starts[windows][:, None]
+        lengths = self.window_lengths[windows][:, None]
+        offsets = np.arange(self.seq_len)[None]
+        if self.pad == 'left':
+            offsets = offsets - (self.seq_len - lengths)
+        mask = np.logical_and(offsets >= 0, offsets < lengths, out=buf['mask'])
+        # Padded positions read the first step of the window and are zeroed below.
+        idxs = (starts + np.where(mask, offsets, 0)).reshape(-1)
+        padded = not mask.all()
+        for k in self.keys:
+            out = buf[k].reshape((-1,) + buf[k].shape[2:])
+            np.take(self.dataset[k], idxs, axis=0, out=out)
+            if padded:
+                buf[k][~mask] = 0
+        return buf
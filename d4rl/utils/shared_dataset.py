@@ -0,0 +1,138 @@
+"""
+Datasets held in shared memory, so that every process on a node can use the
+same copy instead of loading its own.
+"""
+import sys
+import threading
+
+import numpy as np
+
+from d4rl.utils.dataset_utils import IndexedColumn
+
+# Columns are aligned to cache lines inside the shared memory block.
+ALIGNMENT = 64
+
+_ATTACH_LOCK = threading.Lock()
+
+
+def _attach(name):
+    from multiprocessing import resource_tracker, shared_memory
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Older versions register every attachment with the resource tracker,
+    # which then unlinks the block when the attaching process exits.
+    with _ATTACH_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedDataset(object):
+    """
+    A dataset copied once into a multiprocessing.shared_memory block.
+
+    The object itself is small and picklable: passing it to another process
+    (for example as an argument to multiprocessing.Process) only sends the name
+    of the block and the layout of its columns. Calling get() in that process
+    attaches to the block without copying.
+
+    The process that created the dataset owns the block and should call
+    unlink() once every process is done with it.
+
+    Args:
+        dataset: A dictionary of arrays, such as the output of
+            env.get_dataset() or d4rl.qlearning_dataset(). Entries which are
+            not arrays are pickled along with the handle. IndexedColumns
+            are stored as regular arrays.
+    """
+
+    def __init__(self, dataset):
+        self._spec = []
+        self._scalars = {}
+        offset = 0
+        dataset = {k: np.asarray(v) if isinstance(v, IndexedColumn) else v for k, v in dataset.items()}
+        for k, value in dataset.items():
+            if isinstance(value, np.ndarray) and value.dtype.kind != 'O':
+                offset = -(-offset // ALIGNMENT) * ALIGNMENT
+                self._spec.append((k, value.dtype.str, value.shape, offset))
+                offset += value.nbytes
+            else:
+                self._scalars[k] = value
+
+        # Imported here since multiprocessing adds noticeably to the time taken by import d4rl.
+        from multiprocessing import shared_memory
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self._name = self._shm.name
+        self._owner = True
+        for k, dtype, shape, offset in self._spec:
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)[...] = dataset[k]
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def nbytes(self):
+        return self._shm.size if self._shm is not None else None
+
+    def get(self):
+        """
+        Returns the dataset as a dictionary of read-only arrays backed by the
+        shared memory block.
+        """
+        if self._shm is None:
+            self._shm = _attach(self._name)
+        data_dict = dict(self._scalars)
+        for k, dtype, shape, offset in self._spec:
+            array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+            array.flags.writeable = False
+            data_dict[k] = array
+        return data_dict
+
+    def close(self):
+        """
+        Detaches this process from the block. Arrays returned by get() must
+        no longer be referenced.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """Frees the shared memory block. Only valid in the owning process."""
+        if not self._owner:
+            raise ValueError('Only the process that created a SharedDataset can unlink it')
+        shm = self._shm if self._shm is not None else _attach(self._name)
+        shm.unlink()
+        self.close()
+
+    def __getstate__(self):
+        return {'name': self._name, 'spec': self._spec, 'scalars': self._scalars}
+
+    def __setstate__(self, state):
+        self._name = state['name']
+        self._spec = state['spec']
+        self._scalars = state['scalars']
+        self._shm = None
+        self._owner = False
+
+
+def share_dataset(dataset):
+    """
+    Copies a dataset into shared memory.
+
+    Example:
+        handle = d4rl.share_dataset(d4rl.qlearning_dataset(env))
+        # In each worker process, after receiving handle:
+        dataset = handle.get()
+
+    Args:
+        dataset: A dictionary of arrays.
+
+    Returns:
+        A picklable SharedDataset handle.
+    """
+    return SharedDataset(dataset)
@@ -0,0 +1,292 @@
+"""
+Benchmarks dataset loading and the dataset transforms on synthetic HDF5 files
+laid out like the released datasets, and records the wall time, peak memory
+and throughput of every case.
+
+Each layout mirrors the keys, shapes, dtypes, compression and episode
+lengths of a dataset family (gym_mujoco, antmaze, adroit, kitchen and
+carla), scaled down by --scale. Every case runs in a fresh interpreter so
+that its peak resident memory is measured on its own; the HDF5 files are in
+the page cache after the first case, so the times measure decompression and
+copying rather than disk reads.
+
+Usage:
+
+python bench_data_loading.py [--layouts gym_mujoco carla --cases get_dataset lazy
+                              --scale 0.1 --repeats 3 --output results.json
+                              --baseline baseline.json --tolerance 0.25]
+
+Results are written as JSON or CSV, depending on the extension of --output.
+With --baseline, the median time and the peak memory of every case are
+compared against a previous --output file, and the script exits with status 1
+if either grew by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Import d4rl from this checkout, so that the benchmarks run without installing it.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+import h5py
+import numpy as np
+
+from bench_results import compare_results, load_results, report_regressions, write_results
+
+# Rows at --scale 1, roughly the size of the largest dataset of each family.
+LAYOUTS = {
+    'gym_mujoco': dict(num_rows=2000000, obs_dim=17, act_dim=6, episode_steps=1000,
+                       infos={'qpos': (9,), 'qvel': (9,), 'action_log_probs': ()}),
+    'antmaze': dict(num_rows=1000000, obs_dim=29, act_dim=8, episode_steps=1000,
+                    infos={'goal': (2,), 'qpos': (15,), 'qvel': (14,)}),
+    'adroit': dict(num_rows=1000000, obs_dim=39, act_dim=28, episode_steps=200,
+                   infos={'qpos': (30,), 'qvel': (30,), 'door_body_pos': (3,)}),
+    'kitchen': dict(num_rows=137000, obs_dim=60, act_dim=9, episode_steps=280, infos={}),
+    'carla': dict(num_rows=100000, obs_dim=48 * 48 * 3, act_dim=2, episode_steps=1000, infos={}),
+}
+
+# Cases which need the uncompressed copy and the cached sidecars to exist
+# before they are timed. Their *_cold counterparts remove them first.
+WARM_CASES = ['cache', 'lazy', 'minibatch_sampler', 'trajectory_sampler', 'return_targets']
+
+CASES = ['get_dataset', 'get_dataset_workers', 'get_dataset_keys', 'get_dataset_episodes',
+         'get_dataset_shard', 'get_dataset_chunk', 'cache_cold', 'cache', 'lazy',
+         'qlearning_dataset', 'qlearning_dataset_indexed', 'sequence_dataset',
+         'minibatch_sampler', 'trajectory_sampler', 'return_targets_cold', 'return_targets']
+
+NUM_CHUNKS = 4
+
+
+def make_file(path, num_rows, obs_dim, act_dim, episode_steps, infos, seed=0):
+    """Writes a gzip-compressed dataset with the key layout of a released file."""
+    rng = np.random.RandomState(seed)
+    # Episodes end early with a terminal about half of the time.
+    lengths = []
+    while sum(lengths) < num_rows:
+        early = rng.rand() < 0.5
+        lengths.append(rng.randint(episode_steps // 2, episode_steps) if early else episode_steps)
+    ends = np.cumsum(lengths) - 1
+    ends = ends[ends < num_rows]
+    terminals = np.zeros(num_rows, dtype=np.bool_)
+    timeouts = np.zeros(num_rows, dtype=np.bool_)
+    early = np.array(lengths[:len(ends)]) < episode_steps
+    terminals[ends[early]] = True
+    timeouts[ends[~early]] = True
+
+    def smooth(*shape):
+        # Smooth signals compress roughly like real observations do.
+        return np.cumsum(rng.randn(*shape).astype(np.float32) * 0.01, axis=0)
+
+    with h5py.File(path, 'w') as f:
+        f.create_dataset('observations', data=smooth(num_rows, obs_dim), compression='gzip')
+        f.create_dataset('actions', data=rng.uniform(-1, 1, (num_rows, act_dim)).astype(np.float32),
+                         compression='gzip')
+        f.create_dataset('rewards', data=rng.randn(num_rows).astype(np.float32), compression='gzip')
+        f.create_dataset('terminals', data=terminals, compression='gzip')
+        f.create_dataset('timeouts', data=timeouts, compression='gzip')
+        for k, shape in infos.items():
+            f.create_dataset('infos/' + k, data=smooth(num_rows, *shape), compression='gzip')
+        f['metadata/algorithm'] = 'synthetic'
+
+        # Chunks are virtual datasets referring to the main keys, as in the
+        # released chunked files.
+        chunk_rows = num_rows // NUM_CHUNKS
+        for chunk_id in range(NUM_CHUNKS):
+            for k in ['observations', 'actions', 'rewards', 'terminals']:
+                dset = f[k]
+                layout = h5py.VirtualLayout(shape=(chunk_rows,) + dset.shape[1:], dtype=dset.dtype)
+                source = h5py.VirtualSource('.', k, shape=dset.shape)
+                layout[:] = source[chunk_id * chunk_rows:(chunk_id + 1) * chunk_rows]
+                f.create_virtual_dataset('virtual/%d/%s' % (chunk_id, k), layout)
+
+
+def _nbytes(value):
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if hasattr(value, 'shape') and hasattr(value, 'dtype'):
+        return int(np.prod(value.shape, dtype=np.int64)) * np.dtype(value.dtype).itemsize
+    return 0
+
+
+def _memory_mb(field):
+    """Reads VmRSS or VmHWM (the peak) of this process, in MB."""
+    # Unlike ru_maxrss, VmHWM starts over when a process execs, so it does
+    # not include the memory of the parent which started this interpreter.
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def _prepare(case, env, h5path):
+    """Creates or removes the on-disk state a case expects, outside of the timed region."""
+    from d4rl.utils import dataset_cache
+    base = os.path.splitext(h5path)[0]
+    if case == 'cache_cold':
+        dataset_cache.remove_cache(dataset_cache.cache_dir_from_h5path(h5path))
+    elif case == 'return_targets_cold':
+        for name in os.listdir(os.path.dirname(h5path)):
+            if name.startswith(os.path.basename(base) + '_returns_'):
+                os.remove(os.path.join(os.path.dirname(h5path), name))
+    elif case in WARM_CASES:
+        env.get_dataset(h5path=h5path, lazy=True)
+        env.get_episode_index(h5path=h5path)
+        if case == 'return_targets':
+            env.get_return_targets(h5path=h5path)
+
+
+def _run(case, env, h5path):
+    """Runs a case and returns the number of rows and bytes it produced."""
+    import d4rl
+    if case == 'get_dataset':
+        data = env.get_dataset(h5path=h5path)
+    elif case == 'get_dataset_workers':
+        data = env.get_dataset(h5path=h5path, decompress_workers=os.cpu_count())
+    elif case == 'get_dataset_keys':
+        data = env.get_dataset(h5path=h5path, keys=['observations', 'actions', 'rewards', 'terminals', 'timeouts'])
+    elif case == 'get_dataset_episodes':
+        data = env.get_dataset(h5path=h5path, episodes=slice(0, 10))
+    elif case == 'get_dataset_shard':
+        data = env.get_dataset(h5path=h5path, shard_index=0, num_shards=8)
+    elif case == 'get_dataset_chunk':
+        data = env.get_dataset_chunk(0, h5path=h5path)
+    elif case in ('cache_cold', 'cache'):
+        data = env.get_dataset(h5path=h5path, cache=True)
+    elif case == 'lazy':
+        data = env.get_dataset(h5path=h5path, lazy=True)
+    elif case == 'qlearning_dataset':
+        data = d4rl.qlearning_dataset(env, h5path=h5path)
+    elif case == 'qlearning_dataset_indexed':
+        data = d4rl.qlearning_dataset(env, h5path=h5path, copy_next_observations=False)
+    elif case == 'sequence_dataset':
+        rows = nbytes = 0
+        for episode in d4rl.sequence_dataset(env, h5path=h5path):
+            rows += episode['rewards'].shape[0]
+            nbytes += _nbytes(episode)
+        return rows, nbytes
+    elif case in ('minibatch_sampler', 'trajectory_sampler'):
+        dataset = env.get_dataset(h5path=h5path, lazy=True)
+        if case == 'minibatch_sampler':
+            sampler = d4rl.MinibatchSampler(dataset, batch_size=256, seed=0)
+            num_batches = 1000
+        else:
+            sampler = d4rl.TrajectorySampler(dataset, seq_len=20, batch_size=64, seed=0,
+                                             episodes=env.get_episode_index(h5path=h5path))
+            num_batches = 200
+        with sampler:
+            for _ in range(num_batches):
+                batch = sampler.sample()
+        return num_batches * batch['rewards'].size, num_batches * _nbytes(batch)
+    elif case in ('return_targets_cold', 'return_targets'):
+        data = env.get_return_targets(h5path=h5path)
+    else:
+        raise ValueError('Unknown case %s' % case)
+    return data['rewards'].shape[0] if 'rewards' in data else data['returns_to_go'].shape[0], _nbytes(data)
+
+
+def run_case(layout, case, h5path):
+    """Runs one case in the current process and prints its measurements as JSON."""
+    from d4rl.offline_env import DatasetEnv
+    spec = LAYOUTS[layout]
+    env = DatasetEnv(observation_shape=(spec['obs_dim'],), action_shape=(spec['act_dim'],),
+                     max_episode_steps=spec['episode_steps'])
+    _prepare(case, env, h5path)
+    start_rss = _memory_mb('VmRSS')
+    start = time.perf_counter()
+    rows, nbytes = _run(case, env, h5path)
+    seconds = time.perf_counter() - start
+    peak_rss = _memory_mb('VmHWM')
+    print(json.dumps({'seconds': seconds, 'rows': rows, 'bytes': nbytes,
+                      'start_rss_mb': start_rss, 'peak_rss_mb': peak_rss}))
+
+
+def measure(layout, case, h5path):
+    result = subprocess.run([sys.executable, '-W', 'ignore', os.path.abspath(__file__),
+                             '--run_case', layout, case, h5path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError('Case %s/%s failed:\n%s' % (layout, case, result.stderr.decode()))
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--layouts', nargs='+', default=sorted(LAYOUTS), choices=sorted(LAYOUTS))
+    parser.add_argument('--cases', nargs='+', default=CASES, choices=CASES)
+    parser.add_argument('--scale', type=float, default=0.1,
+                        help='Fraction of the full dataset size to generate')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--data_dir', type=str, default=None,
+                        help='Directory for the synthetic files, kept between runs. '
+                             'Defaults to a temporary directory')
+    parser.add_argument('--output', type=str, default=None, help='.json or .csv file for the results')
+    parser.add_argument('--baseline', type=str, default=None, help='Results of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--run_case', nargs=3, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case is not None:
+        run_case(*args.run_case)
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    try:
+        print('%-12s %-26s %9s %11s %12s %9s' % ('layout', 'case', 'seconds', 'peak MB', 'rows/s', 'MB/s'))
+        for layout in args.layouts:
+            spec = dict(LAYOUTS[layout])
+            spec['num_rows'] = max(NUM_CHUNKS * spec['episode_steps'], int(spec['num_rows'] * args.scale))
+            h5path = os.path.join(data_dir, '%s_%d.hdf5' % (layout, spec['num_rows']))
+            if not os.path.exists(h5path):
+                make_file(h5path, **spec)
+            for case in args.cases:
+                runs = [measure(layout, case, h5path) for _ in range(args.repeats)]
+                seconds = median([r['seconds'] for r in runs])
+                row = {
+                    'layout': layout,
+                    'case': case,
+                    'num_rows': spec['num_rows'],
+                    'seconds': seconds,
+                    'min_seconds': min(r['seconds'] for r in runs),
+                    'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+                    'start_rss_mb': max(r['start_rss_mb'] for r in runs),
+                    'rows': runs[0]['rows'],
+                    'rows_per_s': runs[0]['rows'] / seconds,
+                    'mb_per_s': runs[0]['bytes'] / seconds / 1e6,
+                }
+                results.append(row)
+                print('%-12s %-26s %9.3f %11.1f %12.0f %9.1f' % (
+                    layout, case, seconds, row['peak_rss_mb'], row['rows_per_s'], row['mb_per_s']))
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir)
+
+    if args.output is not None:
+        write_results(args.output, results)
+
+    if args.baseline is not None:
+        baseline = load_results(args.baseline)
+        regressions = []
+        for metric in ['seconds', 'peak_rss_mb']:
+            found = compare_results(results, baseline, ['layout', 'case'], metric, args.tolerance)
+            report_regressions(found, metric)
+            regressions.extend(found)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Measures how fast the d4rl environments can be simulated: construction time,
+and the latency distributions of reset and step, along with the number of
+steps per second.
+
+Each env runs in a fresh interpreter, so construction time includes loading
+its simulator. Envs whose simulator is not installed are reported as skipped.
+The time spent choosing actions is measured separately from env.step.
+
+Usage:
+
+python bench_env_step.py [--families maze2d minigrid --actions scripted
+                          --num_steps 5000 --output results.csv
+                          --baseline baseline.csv --tolerance 0.25]
+
+With --actions scripted, maze envs are driven by the waypoint controller used
+to generate their datasets, and other envs replay a fixed smooth action
+sequence. Results are written as JSON or CSV, depending on the extension of
+--output. With --baseline, steps per second and the median reset latency are
+compared against a previous --output file, and the script exits with status 1
+if either got worse by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Import d4rl from this checkout, so that the benchmarks run without installing it.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+
+from bench_results import compare_results, load_results, report_regressions, write_results
+
+FAMILIES = {
+    'maze2d': ['maze2d-umaze-v1', 'maze2d-large-v1'],
+    'antmaze': ['antmaze-umaze-v0', 'antmaze-large-play-v0'],
+    'gym_mujoco': ['hopper-medium-v2', 'halfcheetah-medium-v2', 'ant-medium-v2'],
+    'adroit': ['door-human-v1', 'pen-human-v1', 'hammer-human-v1', 'relocate-human-v1'],
+    'kitchen': ['kitchen-complete-v0'],
+    'minigrid': ['minigrid-fourrooms-v0'],
+    'bullet': ['bullet-hopper-v0', 'bullet-maze2d-umaze-v0'],
+}
+
+
+def _scripted_policy(env, seed):
+    """Returns policy(obs) -> action for --actions scripted."""
+    unwrapped = env.unwrapped
+    if hasattr(unwrapped, 'str_maze_spec') and hasattr(unwrapped, 'get_target'):
+        from d4rl.pointmaze import waypoint_controller
+        controller = waypoint_controller.WaypointController(unwrapped.str_maze_spec)
+
+        def policy(obs):
+            return controller.get_action(obs[0:2], obs[2:4], unwrapped.get_target())[0]
+        return policy
+
+    space = env.action_space
+    if hasattr(space, 'n'):
+        # Discrete actions cycle through every action.
+        step = [0]
+
+        def policy(obs):
+            step[0] += 1
+            return step[0] % space.n
+        return policy
+
+    # A smooth action sequence, which keeps bodies moving without the cost
+    # of sampling every step.
+    rng = np.random.RandomState(seed)
+    phase = rng.uniform(0, 2 * np.pi, space.shape)
+    low, high = space.low, space.high
+    actions = [(low + high) / 2 + (high - low) / 2 * np.sin(phase + 0.05 * t) for t in range(1000)]
+    step = [0]
+
+    def policy(obs):
+        step[0] += 1
+        return actions[step[0] % len(actions)]
+    return policy
+
+
+def _latency_stats(prefix, latencies):
+    latencies = np.asarray(latencies) * 1000.
+    if latencies.shape[0] == 0:
+        return {}
+    return {
+        prefix + '_mean_ms': float(latencies.mean()),
+        prefix + '_p50_ms': float(np.percentile(latencies, 50)),
+        prefix + '_p90_ms': float(np.percentile(latencies, 90)),
+        prefix + '_p99_ms': float(np.percentile(latencies, 99)),
+        prefix + '_max_ms': float(latencies.max()),
+    }
+
+
+def run_env(env_name, actions, num_steps, seed):
+    """Simulates one env in the current process and prints its measurements as JSON."""
+    start = time.perf_counter()
+    import gym
+    import d4rl  # noqa: F401 (registers the envs)
+    import_seconds = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        env = gym.make(env_name)
+        construct_seconds = time.perf_counter() - start
+    except (ImportError, gym.error.DependencyNotInstalled) as e:
+        print(json.dumps({'status': 'skipped', 'reason': '%s: %s' % (type(e).__name__, e)}))
+        return
+
+    np.random.seed(seed)
+    env.action_space.seed(seed)
+    if actions == 'random':
+        policy = lambda obs: env.action_space.sample()
+    else:
+        policy = _scripted_policy(env, seed)
+
+    reset_latencies, step_latencies, policy_latencies = [], [], []
+    start = time.perf_counter()
+    obs = env.reset()
+    reset_latencies.append(time.perf_counter() - start)
+    for _ in range(num_steps):
+        start = time.perf_counter()
+        action = policy(obs)
+        policy_latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        obs, _, done, _ = env.step(action)
+        step_latencies.append(time.perf_counter() - start)
+        if done:
+            start = time.perf_counter()
+            obs = env.reset()
+            reset_latencies.append(time.perf_counter() - start)
+
+    result = {
+        'status': 'ok',
+        'import_seconds': import_seconds,
+        'construct_seconds': construct_seconds,
+        'num_steps': num_steps,
+        'num_resets': len(reset_latencies),
+        'steps_per_s': num_steps / sum(step_latencies),
+    }
+    result.update(_latency_stats('reset', reset_latencies))
+    result.update(_latency_stats('step', step_latencies))
+    result.update(_latency_stats('policy', policy_latencies))
+    print(json.dumps(result))
+
+
+def measure(env_name, actions, num_steps, seed):
+    result = subprocess.run([sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--run_env', env_name,
+                             '--actions', actions, '--num_steps', str(num_steps), '--seed', str(seed)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError('%s failed:\n%s' % (env_name, result.stderr.decode()))
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--families', nargs='+', default=sorted(FAMILIES), choices=sorted(FAMILIES))
+    parser.add_argument('--envs', nargs='+', default=None, help='Env names to run instead of --families')
+    parser.add_argument('--actions', type=str, default='random', choices=['random', 'scripted'])
+    parser.add_argument('--num_steps', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='.json or .csv file for the results')
+    parser.add_argument('--baseline', type=str, default=None, help='Results of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--run_env', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_env is not None:
+        run_env(args.run_env, args.actions, args.num_steps, args.seed)
+        return
+
+    if args.envs is not None:
+        envs = [('custom', env_name) for env_name in args.envs]
+    else:
+        envs = [(family, env_name) for family in args.families for env_name in FAMILIES[family]]
+
+    results = []
+    print('%-32s %12s %10s %10s %10s %10s' % ('env', 'construct s', 'steps/s', 'step p50', 'step p99', 'reset p50'))
+    for family, env_name in envs:
+        row = {'family': family, 'env': env_name, 'actions': args.actions}
+        row.update(measure(env_name, args.actions, args.num_steps, args.seed))
+        results.append(row)
+        if row['status'] != 'ok':
+            print('%-32s skipped (%s)' % (env_name, row['reason'].splitlines()[0]))
+            continue
+        print('%-32s %12.3f %10.0f %8.3fms %8.3fms %8.3fms' % (
+            env_name, row['construct_seconds'], row['steps_per_s'], row['step_p50_ms'], row['step_p99_ms'],
+            row['reset_p50_ms']))
+
+    if args.output is not None:
+        write_results(args.output, results)
+
+    if args.baseline is not None:
+        baseline = load_results(args.baseline)
+        measured = [row for row in results if row['status'] == 'ok']
+        regressions = compare_results(measured, baseline, ['env', 'actions'], 'steps_per_s', args.tolerance,
+                                      higher_is_better=True)
+        report_regressions(regressions, 'steps_per_s')
+        found = compare_results(measured, baseline, ['env', 'actions'], 'reset_p50_ms', args.tolerance)
+        report_regressions(found, 'reset_p50_ms')
+        sys.exit(1 if regressions or found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Measures the time taken by `import d4rl` in fresh interpreters and fails if
+it exceeds a budget, or if importing d4rl pulls in a simulator.
+
+The budget applies to the time d4rl adds on top of importing its own
+dependencies (gym, numpy and h5py), so that it does not depend on the
+installed gym version or on the speed of the machine. Each run of
+`import d4rl` is paired with a run of `import gym, numpy, h5py` right before
+it, and the budget is checked against the median of the differences, so that
+slow runs caused by other load on the machine cancel out. Bytecode is written
+and cached by an untimed first run, so that compiling modules is not counted.
+
+With gym 0.23, import d4rl adds about 0.15-0.2s, most of which is spent in
+gym's register(). The default budget leaves room above that for noise, and
+catches regressions such as a suite importing its simulator.
+
+Usage:
+
+python bench_import_time.py [--budget 0.3 --repeats 15 --profile]
+
+Exits with status 1 if the budget is exceeded.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Import d4rl from this checkout, so that the benchmarks run without installing it.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+# Modules that must only be imported once an env is made.
+SIMULATOR_MODULES = ['mujoco_py', 'mjrl', 'pybullet', 'pybullet_envs', 'flow', 'carla', 'dm_control']
+
+TIMING_SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+
+def _subprocess_env():
+    env = dict(os.environ)
+    # Otherwise modules without up to date bytecode are compiled on every run.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in [REPO_ROOT, env.get('PYTHONPATH')] if p)
+    return env
+
+
+def time_import(statement):
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', TIMING_SNIPPET % statement],
+                                     stderr=subprocess.DEVNULL, env=_subprocess_env())
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def profile_import(num_lines):
+    """Prints the d4rl modules with the largest cumulative import times."""
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import d4rl'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=_subprocess_env())
+    rows = []
+    for line in result.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip().startswith('d4rl'):
+            rows.append((int(cumulative), name.rstrip()))
+    for cumulative, name in sorted(rows, reverse=True)[:num_lines]:
+        print('%10.1f ms %s' % (cumulative / 1000., name))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', type=float, default=0.3,
+                        help='Maximum seconds added by import d4rl over its dependencies')
+    parser.add_argument('--repeats', type=int, default=15)
+    parser.add_argument('--profile', action='store_true', help='Print a per-module breakdown')
+    args = parser.parse_args()
+
+    # The first runs compile and cache the bytecode of any changed modules.
+    time_import('import gym, numpy, h5py')
+    time_import('import d4rl')
+    baseline, runs = [], []
+    for _ in range(args.repeats):
+        baseline.append(time_import('import gym, numpy, h5py')['elapsed'])
+        runs.append(time_import('import d4rl'))
+    overhead = median([r['elapsed'] - b for r, b in zip(runs, baseline)])
+
+    print('import gym, numpy, h5py: %.3fs' % median(baseline))
+    print('import d4rl:             %.3fs' % median([r['elapsed'] for r in runs]))
+    print('d4rl overhead:           %.3fs (budget %.3fs, min %.3fs, max %.3fs)' % (
+        overhead, args.budget, min(r['elapsed'] - b for r, b in zip(runs, baseline)),
+        max(r['elapsed'] - b for r, b in zip(runs, baseline))))
+    if args.profile:
+        profile_import(15)
+
+    failed = False
+    loaded = [m for m in SIMULATOR_MODULES if m in runs[0]['modules']]
+    if loaded:
+        print('FAIL: import d4rl imported simulator modules: %s' % ', '.join(loaded))
+        failed = True
+    if overhead > args.budget:
+        print('FAIL: import d4rl exceeds its time budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures the throughput of reading a gzip-compressed HDF5 key with h5py
+against d4rl.utils.parallel_read at increasing thread counts, and checks
+that every read is byte-identical.
+
+Usage:
+
+python bench_parallel_decompress.py [--h5path <file> --key observations]
+
+Without --h5path, a synthetic gym_mujoco-sized file is written to a
+temporary directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Import d4rl from this checkout, so that the benchmarks run without installing it.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+import h5py
+import numpy as np
+
+from d4rl.utils import parallel_read
+
+
+def make_file(path, num_samples, obs_dim):
+    rng = np.random.RandomState(0)
+    # Smooth signals compress roughly like real observations do.
+    obs = np.cumsum(rng.randn(num_samples, obs_dim).astype(np.float32) * 0.01, axis=0)
+    with h5py.File(path, 'w') as f:
+        f.create_dataset('observations', data=obs, compression='gzip')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--h5path', type=str, default=None)
+    parser.add_argument('--key', type=str, default='observations')
+    parser.add_argument('--num_samples', type=int, default=2000000)
+    parser.add_argument('--obs_dim', type=int, default=17)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        h5path = args.h5path
+        if h5path is None:
+            h5path = os.path.join(tmp_dir, 'synthetic.hdf5')
+            make_file(h5path, args.num_samples, args.obs_dim)
+
+        with h5py.File(h5path, 'r') as f:
+            dset = f[args.key]
+            assert parallel_read.supports_chunk_read(dset), 'Key is not a deflate-compressed chunked dataset'
+            nbytes = dset.size * dset.dtype.itemsize
+
+            def best_time(read_fn):
+                times = []
+                for _ in range(args.repeats):
+                    t0 = time.perf_counter()
+                    data = read_fn()
+                    times.append(time.perf_counter() - t0)
+                return min(times), data
+
+            baseline_time, expected = best_time(lambda: dset[:])
+            print('%-10s %10s %10s' % ('threads', 'MB/s', 'speedup'))
+            print('%-10s %10.1f %10s' % ('h5py', nbytes / baseline_time / 1e6, '1.0x'))
+
+            num_workers = 1
+            while num_workers <= os.cpu_count():
+                t, data = best_time(lambda: parallel_read.read_chunks(dset, num_workers=num_workers))
+                assert data.tobytes() == expected.tobytes(), 'Parallel read is not byte-identical'
+                print('%-10d %10.1f %9.1fx' % (num_workers, nbytes / t / 1e6, baseline_time / t))
+                num_workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compares d4rl.qlearning_dataset against the original per-transition loop
+on a synthetic dataset, and checks that both produce identical outputs.
+
+Usage:
+
+python bench_qlearning_dataset.py --num_samples 2000000 [--no_timeouts] [--terminate_on_end]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Import d4rl from this checkout, so that the benchmarks run without installing it.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+
+import d4rl
+
+
+class _DummyEnv(object):
+    def __init__(self, max_episode_steps):
+        self._max_episode_steps = max_episode_steps
+
+
+def loop_qlearning_dataset(env, dataset, terminate_on_end=False):
+    """The per-transition implementation used before vectorization."""
+    N = dataset['rewards'].shape[0]
+    obs_ = []
+    next_obs_ = []
+    action_ = []
+    reward_ = []
+    done_ = []
+
+    use_timeouts = 'timeouts' in dataset
+
+    episode_step = 0
+    for i in range(N-1):
+        obs = dataset['observations'][i].astype(np.float32)
+        new_obs = dataset['observations'][i+1].astype(np.float32)
+        action = dataset['actions'][i].astype(np.float32)
+        reward = dataset['rewards'][i].astype(np.float32)
+        done_bool = bool(dataset['terminals'][i])
+
+        if use_timeouts:
+            final_timestep = dataset['timeouts'][i]
+        else:
+            final_timestep = (episode_step == env._max_episode_steps - 1)
+        if (not terminate_on_end) and final_timestep:
+            episode_step = 0
+            continue
+        if done_bool or final_timestep:
+            episode_step = 0
+
+        obs_.append(obs)
+        next_obs_.append(new_obs)
+        action_.append(action)
+        reward_.append(reward)
+        done_.append(done_bool)
+        episode_step += 1
+
+    return {
+        'observations': np.array(obs_),
+        'actions': np.array(action_),
+        'next_observations': np.array(next_obs_),
+        'rewards': np.array(reward_),
+        'terminals': np.array(done_),
+    }
+
+
+def make_dataset(num_samples, obs_dim, act_dim, max_episode_steps, timeouts, seed=0):
+    rng = np.random.RandomState(seed)
+    terminals = rng.rand(num_samples) < 1.0 / max_episode_steps
+    dataset = {
+        'observations': rng.randn(num_samples, obs_dim).astype(np.float32),
+        'actions': rng.randn(num_samples, act_dim).astype(np.float32),
+        'rewards': rng.randn(num_samples).astype(np.float32),
+        'terminals': terminals,
+    }
+    if timeouts:
+        episode_step = np.zeros(num_samples, dtype=np.int64)
+        step = 0
+        for i in range(num_samples):
+            step += 1
+            episode_step[i] = step
+            if terminals[i] or step == max_episode_steps:
+                step = 0
+        dataset['timeouts'] = (episode_step == max_episode_steps) & ~terminals
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_samples', type=int, default=1000000)
+    parser.add_argument('--obs_dim', type=int, default=17)
+    parser.add_argument('--act_dim', type=int, default=6)
+    parser.add_argument('--max_episode_steps', type=int, default=1000)
+    parser.add_argument('--no_timeouts', action='store_true')
+    parser.add_argument('--terminate_on_end', action='store_true')
+    args = parser.parse_args()
+
+    env = _DummyEnv(args.max_episode_steps)
+    dataset = make_dataset(args.num_samples, args.obs_dim, args.act_dim,
+                           args.max_episode_steps, timeouts=not args.no_timeouts)
+
+    t0 = time.perf_counter()
+    expected = loop_qlearning_dataset(env, dataset, terminate_on_end=args.terminate_on_end)
+    loop_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    result = d4rl.qlearning_dataset(env, dataset=dataset, terminate_on_end=args.terminate_on_end)
+    vectorized_time = time.perf_counter() - t0
+
+    for k in expected:
+        assert result[k].dtype == expected[k].dtype, 'dtype mismatch for %s' % k
+        assert np.array_equal(result[k], expected[k]), 'value mismatch for %s' % k
+
+    print('transitions:     %d' % result['rewards'].shape[0])
+    print('loop:            %.3fs' % loop_time)
+    print('vectorized:      %.3fs' % vectorized_time)
+    print('speedup:         %.1fx' % (loop_time / vectorized_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Reading, writing and comparing benchmark results.
+
+Results are lists of flat dictionaries, one per measurement, written as JSON
+or CSV depending on the file extension.
+"""
+import csv
+import json
+import os
+
+
+def write_results(path, results):
+    if os.path.splitext(path)[1] == '.csv':
+        fields = []
+        for row in results:
+            fields.extend(k for k in row if k not in fields)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+
+def load_results(path):
+    if os.path.splitext(path)[1] == '.csv':
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            for k, v in row.items():
+                try:
+                    row[k] = float(v)
+                except (TypeError, ValueError):
+                    pass
+        return rows
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(results, baseline, key_fields, metric, tolerance, higher_is_better=False):
+    """
+    Compares a metric between results and a baseline.
+
+    Args:
+        results: The new results.
+        baseline: The baseline results.
+        key_fields (list): Fields identifying matching rows.
+        metric (str): The field to compare.
+        tolerance (float): Allowed relative change in the worse direction.
+        higher_is_better (bool): Whether larger values of metric are better.
+
+    Returns:
+        A list of (key, baseline value, new value) for every regression.
+    """
+    reference = {tuple(row[k] for k in key_fields): row for row in baseline}
+    regressions = []
+    for row in results:
+        key = tuple(row[k] for k in key_fields)
+        if key not in reference or row.get(metric) is None or reference[key].get(metric) is None:
+            continue
+        old, new = float(reference[key][metric]), float(row[metric])
+        if higher_is_better:
+            regressed = new < old * (1 - tolerance)
+        else:
+            regressed = new > old * (1 + tolerance)
+        if regressed:
+            regressions.append((key, old, new))
+    return regressions
+
+
+def report_regressions(regressions, metric):
+    for key, old, new in regressions:
+        print('REGRESSION %s: %s %.4g -> %.4g (%+.1f%%)' % (
+            '/'.join(str(k) for k in key), metric, old, new, 100. * (new - old) / old))
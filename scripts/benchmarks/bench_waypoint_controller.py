@@ -0,0 +1,177 @@
+"""
+Measures the number of WaypointController steps per second in the loop used
+by scripts/generation/generate_maze2d_datasets.py, where a new target is
+chosen every time the previous one is reached.
+
+The point mass is simulated with the same double integrator as the maze2d
+envs (without walls), so that MuJoCo is not needed and the time is spent in
+the controller. Three modes are compared:
+    legacy: WaypointController as it was before it used MazePlanner. Every
+        target is planned from scratch by building dense transition and
+        reward matrices with per-state loops and running dense Q-iteration,
+        as in the original gridcraft and q_iteration code.
+    sparse: Every target is still planned from scratch, but with the current
+        sparse q_iteration.q_iteration.
+    planner: Paths are read from the MazePlanner of the maze.
+
+Usage:
+
+python bench_waypoint_controller.py [--maze large --num_steps 100000 --modes legacy sparse planner]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Import d4rl from this checkout, so that the benchmarks run without installing it.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+
+from d4rl.pointmaze import maze_layouts
+from d4rl.pointmaze import q_iteration
+from d4rl.pointmaze import waypoint_controller
+from d4rl.pointmaze.gridcraft import grid_spec
+
+MAZES = {
+    'umaze': maze_layouts.U_MAZE,
+    'medium': maze_layouts.MEDIUM_MAZE,
+    'large': maze_layouts.LARGE_MAZE,
+}
+
+# Parameters of the maze2d point mass: a sphere of radius 0.1 and density
+# 1000, driven with a gear of 100 against a joint damping of 1.
+MASS = 1000 * 4. / 3 * np.pi * 0.1 ** 3
+GEAR = 100.
+DAMPING = 1.
+TIMESTEP = 0.01
+
+
+def dense_transition_matrix(env):
+    """The dS x dA x dS transition matrix, built one state at a time."""
+    ds = env.num_states
+    da = env.num_actions
+    transition_matrix = np.zeros((ds, da, ds))
+    for s in range(ds):
+        for a in range(da):
+            transitions = env.get_transitions(s, a)
+            for next_s in transitions:
+                transition_matrix[s, a, next_s] = transitions[next_s]
+    return transition_matrix
+
+
+def dense_reward_matrix(env):
+    """The dS x dA x dS reward matrix, built one entry at a time."""
+    ds = env.num_states
+    da = env.num_actions
+    rew_matrix = np.zeros((ds, da, ds))
+    for s in range(ds):
+        for a in range(da):
+            for ns in range(ds):
+                rew_matrix[s, a, ns] = env.rew_fn(env.gs, s, a, ns)
+    return rew_matrix
+
+
+def dense_q_iteration(env, num_itrs=50, discount=0.99):
+    """Hard Q-iteration on dense matrices, as q_iteration.q_iteration used to do."""
+    reward_matrix = dense_reward_matrix(env)[:, :, 0]
+    t_matrix = dense_transition_matrix(env)
+    q_fn = np.zeros((env.num_states, env.num_actions))
+    for _ in range(num_itrs):
+        v_fn = np.max(q_fn, axis=1)
+        q_fn = reward_matrix + discount * t_matrix.dot(v_fn)
+    return q_fn
+
+
+class LegacyWaypointController(waypoint_controller.WaypointController):
+    """Plans every new target from scratch with dense Q-iteration."""
+
+    def _q_iteration(self):
+        return dense_q_iteration(self.env, num_itrs=50, discount=0.99)
+
+    def _new_target(self, start, target):
+        start = self.gridify_state(start)
+        start_idx = self.env.gs.xy_to_idx(start)
+        target = self.gridify_state(target)
+        target_idx = self.env.gs.xy_to_idx(target)
+        self._waypoint_idx = 0
+
+        self.env.gs[target] = grid_spec.REWARD
+        q_values = self._q_iteration()
+        s = start_idx
+        waypoints = []
+        for i in range(100):
+            a = np.argmax(q_values[s])
+            new_s, reward = self.env.step_stateless(s, a)
+            waypoint = self.env.gs.idx_to_xy(new_s)
+            if new_s != target_idx:
+                waypoint = waypoint - np.random.uniform(size=(2,))*0.2
+            waypoints.append(waypoint)
+            s = new_s
+            if new_s == target_idx:
+                break
+        self.env.gs[target] = grid_spec.EMPTY
+        self._waypoints = waypoints
+        self._waypoint_prev_loc = start
+        self._target = target
+
+
+class SparseWaypointController(LegacyWaypointController):
+    """Plans every new target from scratch with sparse Q-iteration."""
+
+    def _q_iteration(self):
+        return q_iteration.q_iteration(env=self.env, num_itrs=50, discount=0.99)
+
+
+CONTROLLERS = {
+    'legacy': LegacyWaypointController,
+    'sparse': SparseWaypointController,
+    'planner': waypoint_controller.WaypointController,
+}
+
+
+def run(controller, maze_str, num_steps, seed):
+    rng = np.random.RandomState(seed)
+    np.random.seed(seed)
+    maze_arr = maze_layouts.parse_maze(maze_str)
+    locations = np.array(np.where(maze_arr != maze_layouts.WALL)).T.astype(np.float64)
+
+    def sample_location():
+        return locations[rng.randint(len(locations))] + rng.uniform(-.1, .1, size=2)
+
+    position, velocity = sample_location(), np.zeros(2)
+    target = sample_location()
+    num_targets = 1
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        action, done = controller.get_action(position, velocity, target)
+        accel = (GEAR * np.clip(action, -1.0, 1.0) - DAMPING * velocity) / MASS
+        velocity = np.clip(velocity + TIMESTEP * accel, -5.0, 5.0)
+        position = position + TIMESTEP * velocity
+        if done:
+            target = sample_location()
+            num_targets += 1
+    return time.perf_counter() - start, num_targets
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--maze', type=str, default='large', choices=sorted(MAZES))
+    parser.add_argument('--num_steps', type=int, default=100000)
+    parser.add_argument('--modes', nargs='+', default=['legacy', 'sparse', 'planner'],
+                        choices=['legacy', 'sparse', 'planner'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    maze_str = MAZES[args.maze]
+    print('%-10s %12s %10s %12s' % ('mode', 'steps/s', 'targets', 'us/target'))
+    for mode in args.modes:
+        controller = CONTROLLERS[mode](maze_str)
+        seconds, num_targets = run(controller, maze_str, args.num_steps, args.seed)
+        print('%-10s %12.0f %10d %12.1f' % (mode, args.num_steps / seconds, num_targets,
+                                            1e6 * seconds / num_targets))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,7 @@ def reset_data():
     return {'observations': [],
             'actions': [],
             'terminals': [],
+            'timeouts': [],
             'rewards': [],
             'infos/goal': [],
             'infos/qpos': [],
@@ -24,13 +25,14 @@ def append_data(data, s, a, tgt, done, env_data):
     data['actions'].append(a)
     data['rewards'].append(0.0)
     data['terminals'].append(done)
+    data['timeouts'].append(False)
     data['infos/goal'].append(tgt)
     data['infos/qpos'].append(env_data.qpos.ravel().copy())
     data['infos/qvel'].append(env_data.qvel.ravel().copy())
 
 def npify(data):
     for k in data:
-        if k == 'terminals':
+        if k in ('terminals', 'timeouts'):
             dtype = np.bool_
         else:
             dtype = np.float32
@@ -43,51 +45,61 @@ def main():
     parser.add_argument('--noisy', action='store_true', help='Noisy actions')
     parser.add_argument('--env_name', type=str, default='maze2d-umaze-v1', help='Maze type')
     parser.add_argument('--num_samples', type=int, default=int(1e6), help='Num samples to collect')
+    parser.add_argument('--num_envs', type=int, default=1, help='Num envs to simulate side by side')
     args = parser.parse_args()
 
     env = gym.make(args.env_name)
     maze = env.str_maze_spec
     max_episode_steps = env._max_episode_steps
 
-    controller = waypoint_controller.WaypointController(maze)
-    env = maze_model.MazeEnv(maze)
-
-    env.set_target()
-    s = env.reset()
-    act = env.action_space.sample()
-    done = False
-
-    data = reset_data()
-    ts = 0
-    for _ in range(args.num_samples):
-        position = s[0:2]
-        velocity = s[2:4]
-        act, done = controller.get_action(position, velocity, env._target)
+    controller = waypoint_controller.BatchedWaypointController(maze, num_agents=args.num_envs)
+    envs = [maze_model.MazeEnv(maze) for _ in range(args.num_envs)]
+
+    for env in envs:
+        env.set_target()
+    s = np.stack([env.reset() for env in envs])
+
+    # Each env fills its own buffer, so that its trajectories stay contiguous.
+    env_data = [reset_data() for _ in envs]
+    ts = np.zeros(args.num_envs, dtype=np.int64)
+    num_steps = -(-args.num_samples // args.num_envs)
+    for step in range(num_steps):
+        position = s[:, 0:2]
+        velocity = s[:, 2:4]
+        targets = np.stack([env._target for env in envs])
+        act, done = controller.get_action(position, velocity, targets)
         if args.noisy:
             act = act + np.random.randn(*act.shape)*0.5
 
         act = np.clip(act, -1.0, 1.0)
-        if ts >= max_episode_steps:
-            done = True
-        append_data(data, s, act, env._target, done, env.sim.data)
-
-        ns, _, _, _ = env.step(act)
-
-        if len(data['observations']) % 10000 == 0:
-            print(len(data['observations']))
-
-        ts += 1
-        if done:
-            env.set_target()
-            done = False
-            ts = 0
-        else:
-            s = ns
-
-        if args.render:
-            env.render()
+        done = done | (ts >= max_episode_steps)
+        for i, env in enumerate(envs):
+            append_data(env_data[i], s[i], act[i], env._target, done[i], env.sim.data)
+            ns, _, _, _ = env.step(act[i])
+
+            ts[i] += 1
+            if done[i]:
+                env.set_target()
+                ts[i] = 0
+            else:
+                s[i] = ns
+
+            if args.render and i == 0:
+                env.render()
+
+        if (step + 1) * args.num_envs % 10000 < args.num_envs:
+            print((step + 1) * args.num_envs)
+
+    # Split num_samples between the envs, and mark the step where each env's
+    # data is cut as a timeout, so that it is not joined to the next env's.
+    for i, d in enumerate(env_data):
+        num_env_samples = args.num_samples // args.num_envs + (i < args.num_samples % args.num_envs)
+        for k in d:
+            del d[k][num_env_samples:]
+        if num_env_samples > 0:
+            d['timeouts'][-1] = True
+    data = {k: sum((d[k] for d in env_data), []) for k in env_data[0]}
 
-    
     if args.noisy:
         fname = '%s-noisy.hdf5' % args.env_name
     else:
@@ -10,25 +10,29 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--env_name', type=str, default='maze2d-umaze-v0', help='Maze type. small or default')
     parser.add_argument('--num_episodes', type=int, default=100, help='Num samples to collect')
+    parser.add_argument('--num_envs', type=int, default=1, help='Num envs to simulate side by side')
     args = parser.parse_args()
 
-    env = gym.make(args.env_name)
-    env.seed(0)
+    envs = [gym.make(args.env_name) for _ in range(args.num_envs)]
+    for i, env in enumerate(envs):
+        env.seed(i)
     np.random.seed(0)
-    controller = waypoint_controller.WaypointController(env.str_maze_spec)
+    controller = waypoint_controller.BatchedWaypointController(envs[0].str_maze_spec, num_agents=args.num_envs)
 
     ravg = []
-    for _ in range(args.num_episodes):
-        s = env.reset()
-        returns = 0
-        for t in range(env._max_episode_steps):
-            position = s[0:2]
-            velocity = s[2:4]
-            act, done = controller.get_action(position, velocity, env.get_target())
-            s, rew, _, _ = env.step(act)
-            returns += rew
-        ravg.append(returns)
-    print(args.env_name, 'returns', np.mean(ravg))
+    while len(ravg) < args.num_episodes:
+        s = np.stack([env.reset() for env in envs])
+        returns = np.zeros(args.num_envs)
+        for t in range(envs[0]._max_episode_steps):
+            position = s[:, 0:2]
+            velocity = s[:, 2:4]
+            targets = np.stack([env.get_target() for env in envs])
+            act, done = controller.get_action(position, velocity, targets)
+            for i, env in enumerate(envs):
+                s[i], rew, _, _ = env.step(act[i])
+                returns[i] += rew
+        ravg.extend(returns)
+    print(args.env_name, 'returns', np.mean(ravg[:args.num_episodes]))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+import h5py
+import numpy as np
+import pytest
+
+import d4rl
+
+
+def write_dataset(path, num_rows=3000, obs_dim=5, act_dim=2, max_episode_steps=100,
+                  timeouts=True, terminal_prob=0.005, infos=False, virtual_chunks=0, seed=0):
+    """Writes a synthetic dataset with random episode terminations and time limits."""
+    rng = np.random.RandomState(seed)
+    terminals = rng.rand(num_rows) < terminal_prob
+    final_timesteps = np.zeros(num_rows, dtype=np.bool_)
+    episode_step = 0
+    for i in range(num_rows):
+        episode_step += 1
+        if terminals[i]:
+            episode_step = 0
+        elif episode_step == max_episode_steps:
+            final_timesteps[i] = True
+            episode_step = 0
+    with h5py.File(path, 'w') as f:
+        f.create_dataset('observations', data=rng.randn(num_rows, obs_dim).astype(np.float32), compression='gzip')
+        f.create_dataset('actions', data=rng.randn(num_rows, act_dim).astype(np.float32), compression='gzip')
+        f.create_dataset('rewards', data=rng.randn(num_rows).astype(np.float32), compression='gzip')
+        f.create_dataset('terminals', data=terminals, compression='gzip')
+        if timeouts:
+            f.create_dataset('timeouts', data=final_timesteps, compression='gzip')
+        if infos:
+            f.create_dataset('infos/qpos', data=rng.randn(num_rows, 3), compression='gzip')
+            f.create_dataset('infos/goal', data=rng.randn(num_rows, 2), compression='gzip')
+            f.create_dataset('metadata/algorithm', data='SAC')
+        # Chunks of the main keys stored as virtual/<chunk_id>/<key>, like chunked D4RL datasets.
+        for chunk_id in range(virtual_chunks):
+            chunk_rows = num_rows // virtual_chunks
+            for k in ['observations', 'actions', 'rewards', 'terminals']:
+                dset = f[k]
+                layout = h5py.VirtualLayout(shape=(chunk_rows,) + dset.shape[1:], dtype=dset.dtype)
+                source = h5py.VirtualSource('.', k, shape=dset.shape)
+                layout[:] = source[chunk_id * chunk_rows:(chunk_id + 1) * chunk_rows]
+                f.create_virtual_dataset('virtual/%d/%s' % (chunk_id, k), layout)
+    return path
+
+
+@pytest.fixture
+def make_dataset(tmp_path):
+    """Returns make(name, **kwargs) -> (env, h5path) for a synthetic dataset in tmp_path."""
+
+    def make(name='dataset.hdf5', max_episode_steps=100, **kwargs):
+        h5path = write_dataset(str(tmp_path / name), max_episode_steps=max_episode_steps, **kwargs)
+        env = d4rl.DatasetEnv(max_episode_steps=max_episode_steps)
+        return env, h5path
+    return make
@@ -0,0 +1,24 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+from d4rl.utils import dataset_cache
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_virtual_chunks_are_views(make_dataset, mmap):
+    _, h5path = make_dataset(virtual_chunks=3, infos=True)
+    cache_dir = dataset_cache.build_cache(h5path)
+    assert not os.path.exists(os.path.join(cache_dir, 'virtual'))
+
+    data = dataset_cache.load_cache(cache_dir, mmap=mmap)
+    with h5py.File(h5path, 'r') as f:
+        assert sorted(data) == sorted(dataset_cache.cached_keys(cache_dir))
+        for k, value in data.items():
+            np.testing.assert_array_equal(value, f[k][()], err_msg=k)
+            assert isinstance(value, np.memmap) == (mmap and np.ndim(value) > 0), k
+
+    chunk = dataset_cache.load_cache(cache_dir, mmap=mmap, keys=['virtual/1/actions'])
+    np.testing.assert_array_equal(chunk['virtual/1/actions'], data['actions'][1000:2000])
@@ -0,0 +1,19 @@
+import gym
+import pytest
+
+import d4rl
+
+
+def test_dataset_env_cannot_be_simulated():
+    env = d4rl.make_dataset_env('maze2d-umaze-v1')
+    with pytest.raises(gym.error.Error, match=r"gym.make\('maze2d-umaze-v1'\)"):
+        env.reset()
+    with pytest.raises(gym.error.Error, match='cannot be reset or stepped'):
+        env.step(None)
+    assert env.dataset_url.endswith('.hdf5')
+    assert env._max_episode_steps == 300
+
+
+def test_dataset_env_without_spec():
+    with pytest.raises(gym.error.Error, match=r'gym.make\(env_name\)'):
+        d4rl.DatasetEnv().reset()
@@ -0,0 +1,154 @@
+import hashlib
+import http.server
+import os
+import re
+import threading
+
+import numpy as np
+import pytest
+
+import d4rl.offline_env
+from d4rl.utils import download
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves the server's data, optionally without Range support or closing connections early."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send_headers(self, status, length, content_range=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        if self.server.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if content_range is not None:
+            self.send_header('Content-Range', content_range)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers(200, len(self.server.data))
+
+    def do_GET(self):
+        data = self.server.data
+        start, end = 0, len(data)
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if match is not None and self.server.accept_ranges:
+            start, end = int(match.group(1)), int(match.group(2)) + 1
+            self.server.requested_ranges.append((start, end))
+            self._send_headers(206, end - start, 'bytes %d-%d/%d' % (start, end - 1, len(data)))
+        else:
+            self._send_headers(200, end - start)
+        if self.server.fail_after is not None:
+            # Simulates a dropped connection part way through the transfer.
+            end = min(end, start + self.server.fail_after)
+            self.server.fail_after = None
+        self.wfile.write(data[start:end])
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.data = np.random.RandomState(0).bytes(300 * 1024)
+    httpd.accept_ranges = True
+    httpd.fail_after = None
+    httpd.requested_ranges = []
+    httpd.url = 'http://127.0.0.1:%d/dataset.hdf5' % httpd.server_address[1]
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Splits the small test file into several ranges, and saves progress often.
+    monkeypatch.setattr(download, 'BLOCK_SIZE', 4096)
+    monkeypatch.setattr(download, 'MIN_SPLIT_SIZE', 1)
+    monkeypatch.setattr(download, 'STATE_SAVE_INTERVAL', 4096)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('accept_ranges', [True, False])
+def test_full_download(server, tmp_path, accept_ranges):
+    server.accept_ranges = accept_ranges
+    filepath = str(tmp_path / 'dataset.hdf5')
+    sha256 = hashlib.sha256(server.data).hexdigest()
+    checksum = download.download(server.url, filepath, size=len(server.data), sha256=sha256,
+                                 show_progress=False)
+    assert checksum == sha256
+    assert _read(filepath) == server.data
+    assert len(server.requested_ranges) == (4 if accept_ranges else 0)
+    assert sorted(os.listdir(str(tmp_path))) == ['dataset.hdf5']
+
+
+def test_resume_after_truncation(server, tmp_path):
+    filepath = str(tmp_path / 'dataset.hdf5')
+    server.fail_after = 40 * 1024
+    with pytest.raises(IOError):
+        download.download(server.url, filepath, retries=0, num_connections=1, show_progress=False)
+    assert not os.path.exists(filepath)
+    assert os.path.exists(filepath + '.part.json')
+
+    download.download(server.url, filepath, num_connections=1, show_progress=False)
+    assert _read(filepath) == server.data
+    # The second download continues from the saved position.
+    assert server.requested_ranges[0][0] == 0
+    assert server.requested_ranges[1][0] >= 32 * 1024
+    assert not os.path.exists(filepath + '.part.json')
+
+
+def test_retry_without_range_support(server, tmp_path):
+    server.accept_ranges = False
+    server.fail_after = 40 * 1024
+    filepath = str(tmp_path / 'dataset.hdf5')
+    download.download(server.url, filepath, retries=1, show_progress=False)
+    assert _read(filepath) == server.data
+
+
+def test_checksum_mismatch(server, tmp_path):
+    filepath = str(tmp_path / 'dataset.hdf5')
+    with pytest.raises(IOError, match='Checksum mismatch'):
+        download.download(server.url, filepath, sha256='0' * 64, show_progress=False)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_size_mismatch(server, tmp_path):
+    with pytest.raises(IOError, match='expected'):
+        download.download(server.url, str(tmp_path / 'dataset.hdf5'), size=len(server.data) + 1,
+                          show_progress=False)
+
+
+def test_download_dataset_from_url_uses_manifest(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(d4rl.offline_env, 'DATASET_PATH', str(tmp_path))
+    sha256 = hashlib.sha256(server.data).hexdigest()
+    monkeypatch.setitem(d4rl.offline_env.DATASET_MANIFEST, 'dataset.hdf5',
+                        {'size': len(server.data), 'sha256': sha256})
+    filepath = d4rl.offline_env.download_dataset_from_url(server.url)
+    assert _read(filepath) == server.data
+
+    monkeypatch.setitem(d4rl.offline_env.DATASET_MANIFEST, 'dataset.hdf5', {'sha256': '0' * 64})
+    os.remove(filepath)
+    with pytest.raises(IOError, match='Checksum mismatch'):
+        d4rl.offline_env.download_dataset_from_url(server.url)
+    assert not os.path.exists(filepath)
+
+
+def test_incomplete_dataset_only_removed_under_lock(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(d4rl.offline_env, 'DATASET_PATH', str(tmp_path))
+    monkeypatch.setitem(d4rl.offline_env.DATASET_MANIFEST, 'dataset.hdf5', {'size': len(server.data)})
+    filepath = str(tmp_path / 'dataset.hdf5')
+    with open(filepath, 'wb') as f:
+        f.write(server.data[:100])
+    expected = d4rl.offline_env.DATASET_MANIFEST['dataset.hdf5']
+    # Outside the lock the file may be another process's, it is only reported.
+    assert d4rl.offline_env._dataset_needs_download(filepath, expected)
+    assert os.path.exists(filepath)
+
+    assert d4rl.offline_env.download_dataset_from_url(server.url) == filepath
+    assert _read(filepath) == server.data
@@ -0,0 +1,25 @@
+import os
+
+from d4rl import offline_env
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_fingerprint_changes_with_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(offline_env, 'FINGERPRINT_BLOCK_SIZE', 16)
+    path = _write(str(tmp_path / 'a.hdf5'), b'x' * 100)
+    fingerprint = offline_env.file_fingerprint(path)
+    assert offline_env.file_fingerprint(path) == fingerprint
+
+    _write(path, b'x' * 99 + b'y')
+    os.utime(path, ns=(0, 12345))
+    assert offline_env.file_fingerprint(path) != fingerprint
+    fingerprint = offline_env.file_fingerprint(path)
+    # Same contents, different modification time.
+    os.utime(path, ns=(0, 67890))
+    assert offline_env.file_fingerprint(path) != fingerprint
+
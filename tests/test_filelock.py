@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from d4rl.utils import filelock
+
+
+def _append_under_lock(lock_path, log_path, tag):
+    for _ in range(5):
+        with filelock.FileLock(lock_path, poll_interval=0.01):
+            with open(log_path, 'a') as f:
+                f.write('%s start\n' % tag)
+            time.sleep(0.005)
+            with open(log_path, 'a') as f:
+                f.write('%s end\n' % tag)
+
+
+def _assert_not_interleaved(log_path, count):
+    with open(log_path) as f:
+        lines = f.read().split('\n')[:-1]
+    assert len(lines) == 2 * count
+    for start, end in zip(lines[::2], lines[1::2]):
+        assert start.endswith(' start') and end == start.replace('start', 'end')
+
+
+@pytest.fixture(params=[True, False], ids=['fcntl', 'owner_file'])
+def use_fcntl(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(filelock, 'fcntl', None)
+    return request.param
+
+
+def test_threads_are_serialized(tmp_path, use_fcntl):
+    lock_path, log_path = str(tmp_path / 'a.lock'), str(tmp_path / 'log')
+    threads = [threading.Thread(target=_append_under_lock, args=(lock_path, log_path, i)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _assert_not_interleaved(log_path, 4 * 5)
+    assert not os.path.exists(lock_path + '.owner')
+
+
+def test_processes_are_serialized(tmp_path):
+    lock_path, log_path = str(tmp_path / 'a.lock'), str(tmp_path / 'log')
+    ctx = multiprocessing.get_context('spawn')
+    processes = [ctx.Process(target=_append_under_lock, args=(lock_path, log_path, i)) for i in range(3)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+    _assert_not_interleaved(log_path, 3 * 5)
+
+
+def test_timeout(tmp_path, use_fcntl):
+    lock_path = str(tmp_path / 'a.lock')
+    errors = []
+
+    def try_lock():
+        try:
+            with filelock.FileLock(lock_path, timeout=0.1, poll_interval=0.01):
+                pass
+        except TimeoutError as e:
+            errors.append(e)
+
+    with filelock.FileLock(lock_path):
+        t = threading.Thread(target=try_lock)
+        t.start()
+        t.join()
+    assert len(errors) == 1
+
+
+def test_live_owner_file_is_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(filelock, 'fcntl', None)
+    lock_path = str(tmp_path / 'a.lock')
+    with open(lock_path + '.owner', 'w') as f:
+        f.write('otherhost:1\n')
+    with pytest.raises(TimeoutError):
+        filelock.FileLock(lock_path, timeout=0.1, poll_interval=0.01, stale_after=60).acquire()
+    assert sorted(os.listdir(str(tmp_path))) == ['a.lock.owner']
+
+
+def test_stale_owner_file_is_broken(tmp_path, monkeypatch):
+    monkeypatch.setattr(filelock, 'fcntl', None)
+    lock_path = str(tmp_path / 'a.lock')
+    with open(lock_path + '.owner', 'w') as f:
+        f.write('otherhost:1\n')
+    os.utime(lock_path + '.owner', (0, 0))
+    with pytest.warns(UserWarning, match='Breaking stale lock'):
+        with filelock.FileLock(lock_path, timeout=5, poll_interval=0.01, stale_after=60):
+            with open(lock_path + '.owner') as f:
+                assert f.read() != 'otherhost:1\n'
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_refreshed_owner_file_is_put_back(tmp_path):
+    # The owner file found stale was refreshed or replaced before it was renamed away.
+    lock_path = str(tmp_path / 'a.lock')
+    with open(lock_path + '.owner', 'w') as f:
+        f.write('otherhost:1\n')
+    filelock.FileLock(lock_path, stale_after=60)._break_stale_owner_file(lock_path + '.owner')
+    assert os.listdir(str(tmp_path)) == ['a.lock.owner']
+    with open(lock_path + '.owner') as f:
+        assert f.read() == 'otherhost:1\n'
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_window_leaves_out_virtual_chunks(make_dataset, cache):
+    env, h5path = make_dataset(virtual_chunks=3, infos=True)
+    whole = env.get_dataset(h5path=h5path, cache=cache)
+    assert 'virtual/2/observations' in whole
+    np.testing.assert_array_equal(whole['virtual/1/observations'], whole['observations'][1000:2000])
+
+    window = env.get_dataset(h5path=h5path, cache=cache, start=1200, stop=1300)
+    assert not any(k.startswith('virtual/') for k in window)
+    assert window['metadata/algorithm'] == whole['metadata/algorithm']
+    for k, value in window.items():
+        if np.ndim(value) > 0:
+            np.testing.assert_array_equal(value, whole[k][1200:1300], err_msg=k)
+
+
+@pytest.mark.parametrize('num_shards', [2, 5])
+def test_shards_only_hold_their_rows(make_dataset, num_shards):
+    env, h5path = make_dataset(virtual_chunks=3, infos=True, terminal_prob=0.01)
+    total = 0
+    for i in range(num_shards):
+        start, stop = env.dataset_rows(h5path, shard_index=i, num_shards=num_shards)
+        shard = env.get_dataset(h5path=h5path, shard_index=i, num_shards=num_shards)
+        for k, value in shard.items():
+            assert np.ndim(value) == 0 or len(value) == stop - start, k
+        total += stop - start
+    assert total == 3000
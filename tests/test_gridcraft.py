@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from d4rl.pointmaze import maze_layouts
+from d4rl.pointmaze import q_iteration
+from d4rl.pointmaze.gridcraft import grid_env
+from d4rl.pointmaze.gridcraft import grid_spec
+
+MAZES = [maze_layouts.U_MAZE, maze_layouts.MEDIUM_MAZE, "#####\\#OLO#\\#O#R#\\#S2O#\\#####"]
+
+
+def loop_transition_matrix(env):
+    """The per-(state, action) construction used before the sparse matrices."""
+    ds, da = env.num_states, env.num_actions
+    transition_matrix = np.zeros((ds, da, ds))
+    for s in range(ds):
+        for a in range(da):
+            transitions = env.get_transitions(s, a)
+            for next_s in transitions:
+                transition_matrix[s, a, next_s] = transitions[next_s]
+    return transition_matrix
+
+
+def loop_reward_matrix(env):
+    ds, da = env.num_states, env.num_actions
+    rew_matrix = np.zeros((ds, da, ds))
+    for s in range(ds):
+        for a in range(da):
+            for ns in range(ds):
+                rew_matrix[s, a, ns] = env.rew_fn(env.gs, s, a, ns)
+    return rew_matrix
+
+
+def dense_softq_iteration(env, num_itrs, discount, ent_wt):
+    """softq_iteration on dense matrices, as it was before the sparse matrices."""
+    reward_matrix = loop_reward_matrix(env)[:, :, 0]
+    t_matrix = loop_transition_matrix(env)
+    q_fn = np.zeros((env.num_states, env.num_actions))
+    for _ in range(num_itrs):
+        v_fn = q_iteration.logsumexp(q_fn, alpha=ent_wt)
+        q_fn = reward_matrix + discount * t_matrix.dot(v_fn)
+    return q_fn
+
+
+def dense_visitation(env, q_fn, ent_wt, env_time_limit=50):
+    pol_probs = q_iteration.get_policy(q_fn, ent_wt=ent_wt)
+    state_visitation = np.zeros((env.num_states, 1))
+    for state, prob in env.initial_state_distribution.items():
+        state_visitation[state] = prob
+    t_matrix = loop_transition_matrix(env)
+    sa_visit_t = np.zeros((env.num_states, env.num_actions, env_time_limit))
+    for i in range(env_time_limit):
+        sa_visit = state_visitation * pol_probs
+        sa_visit_t[:, :, i] = sa_visit
+        state_visitation = np.expand_dims(np.einsum('ij,ijk->k', sa_visit, t_matrix), axis=1)
+    return np.sum(sa_visit_t, axis=2) / float(env_time_limit)
+
+
+def make_env(maze, teps):
+    env = grid_env.GridEnv(grid_spec.spec_from_string(maze), teps=teps)
+    env.initial_state_distribution = {env.gs.xy_to_idx((1, 1)): 1.0}
+    return env
+
+
+@pytest.mark.parametrize('maze', MAZES)
+@pytest.mark.parametrize('teps', [0.0, 0.2])
+def test_matrices_match_loops(maze, teps):
+    env = make_env(maze, teps)
+    expected_t = loop_transition_matrix(env)
+    expected_r = loop_reward_matrix(env)
+    ds, da = env.num_states, env.num_actions
+
+    np.testing.assert_allclose(env.transition_matrix(), expected_t)
+    np.testing.assert_allclose(env.reward_matrix(), expected_r)
+
+    sparse_t = env.sparse_transition_matrix()
+    sparse_r = env.sparse_reward_matrix()
+    assert sparse_t.shape == sparse_r.shape == (ds * da, ds)
+    np.testing.assert_allclose(sparse_t.toarray().reshape(ds, da, ds), expected_t)
+    # The sparse rewards hold the rewards of every possible transition.
+    np.testing.assert_array_equal(sparse_r.indptr, sparse_t.indptr)
+    np.testing.assert_array_equal(sparse_r.indices, sparse_t.indices)
+    np.testing.assert_allclose(sparse_r.toarray().reshape(ds, da, ds), expected_r * (expected_t > 0))
+
+
+@pytest.mark.parametrize('maze', MAZES)
+@pytest.mark.parametrize('teps', [0.0, 0.2])
+def test_q_iteration_matches_dense(maze, teps):
+    env = make_env(maze, teps)
+    expected = dense_softq_iteration(env, num_itrs=50, discount=0.99, ent_wt=0.0)
+    np.testing.assert_allclose(q_iteration.q_iteration(env=env, num_itrs=50, discount=0.99), expected)
+    # Dense matrices are still accepted.
+    q_fn = q_iteration.q_iteration(env=env, num_itrs=50, discount=0.99,
+                                   transition_matrix=env.transition_matrix(), reward_matrix=env.reward_matrix())
+    np.testing.assert_allclose(q_fn, expected)
+
+    expected = dense_softq_iteration(env, num_itrs=30, discount=0.99, ent_wt=0.1)
+    q_fn = q_iteration.softq_iteration(env, num_itrs=30, ent_wt=0.1)
+    np.testing.assert_allclose(q_fn, expected)
+    np.testing.assert_allclose(q_iteration.compute_visitation(env, q_fn, ent_wt=0.1),
+                               dense_visitation(env, q_fn, ent_wt=0.1), atol=1e-12)
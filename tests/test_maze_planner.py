@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from d4rl.pointmaze import maze_layouts
+from d4rl.pointmaze import maze_planner
+from d4rl.pointmaze import q_iteration
+from d4rl.pointmaze.gridcraft import grid_env
+from d4rl.pointmaze.gridcraft import grid_spec
+
+
+def q_iteration_path(env, start, target):
+    """Plans a path as WaypointController did before MazePlanner, without jitter."""
+    start_idx, target_idx = env.gs.xy_to_idx(start), env.gs.xy_to_idx(target)
+    env.gs[target] = grid_spec.REWARD
+    q_values = q_iteration.q_iteration(env=env, num_itrs=50, discount=0.99)
+    env.gs[target] = grid_spec.EMPTY
+    s, path = start_idx, []
+    for _ in range(100):
+        if s == target_idx:
+            break
+        s, _ = env.step_stateless(s, np.argmax(q_values[s]))
+        path.append(tuple(int(c) for c in env.gs.idx_to_xy(s)))
+    return path
+
+
+@pytest.mark.parametrize('maze_str,num_targets', [(maze_layouts.U_MAZE, None), (maze_layouts.MEDIUM_MAZE, 6)])
+def test_paths_match_q_iteration(maze_str, num_targets):
+    planner = maze_planner.MazePlanner(maze_str)
+    env = grid_env.GridEnv(grid_spec.spec_from_string(maze_str))
+    cells = [tuple(int(c) for c in cell) for cell in planner.free_cells]
+    targets = cells if num_targets is None else [cells[i] for i in
+                                                 np.random.RandomState(0).choice(len(cells), num_targets)]
+    for target in targets:
+        for start in cells:
+            path = planner.path(start, target)
+            assert path == q_iteration_path(env, start, target), (start, target)
+            assert len(path) == planner.distance(start, target)
+
+
+def test_unreachable_and_walls():
+    planner = maze_planner.MazePlanner("#####\\#O#O#\\#####")
+    # Cells are (row, column) of the maze string.
+    assert planner.distance((1, 1), (1, 3)) == -1
+    with pytest.raises(ValueError):
+        planner.path((1, 1), (1, 3))
+    with pytest.raises(ValueError):
+        planner.path((1, 1), (1, 2))
+
+
+def test_get_planner_is_cached():
+    assert maze_planner.get_planner(maze_layouts.U_MAZE) is maze_planner.get_planner(maze_layouts.U_MAZE)
+
+
+def test_multigoal_value_iteration_matches_single_goals():
+    gs = grid_spec.spec_from_string(maze_layouts.U_MAZE)
+    env = grid_env.GridEnv(gs)
+    goals = [gs.xy_to_idx(cell) for cell in [(1, 1), (3, 1), (3, 3)]]
+    values = q_iteration.multigoal_value_iteration(env.sparse_transition_matrix(), goals, env.num_states,
+                                                   env.num_actions, num_itrs=50, discount=0.99)
+    assert values.shape == (env.num_states, len(goals))
+    for g, goal in enumerate(goals):
+        cell = tuple(gs.idx_to_xy(goal))
+        env.gs[cell] = grid_spec.REWARD
+        q_fn = q_iteration.q_iteration(env=env, num_itrs=50, discount=0.99)
+        env.gs[cell] = grid_spec.EMPTY
+        np.testing.assert_allclose(values[:, g], q_fn.max(axis=1))
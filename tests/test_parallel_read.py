@@ -0,0 +1,58 @@
+import h5py
+import numpy as np
+import pytest
+
+from d4rl.utils import parallel_read
+
+
+@pytest.fixture
+def h5file(tmp_path):
+    with h5py.File(str(tmp_path / 'data.hdf5'), 'w') as f:
+        yield f
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+@pytest.mark.parametrize('dtype', ['<f4', '>f4', '>i8', '<u2', 'bool'])
+@pytest.mark.parametrize('shape, chunks', [
+    ((1000,), (64,)),
+    ((1001, 7), (100, 3)),  # partial chunks at the end of both axes
+    ((50, 4, 3), (7, 4, 2)),
+])
+def test_matches_h5py(h5file, shuffle, dtype, shape, chunks):
+    rng = np.random.RandomState(0)
+    data = (rng.randn(*shape) * 1000).astype(dtype)
+    dset = h5file.create_dataset('x', data=data, chunks=chunks, compression='gzip', shuffle=shuffle)
+    assert parallel_read.supports_chunk_read(dset)
+
+    result = parallel_read.read_chunks(dset, num_workers=3)
+    assert result.dtype == dset.dtype
+    np.testing.assert_array_equal(result, dset[...])
+    for start, stop in [(0, 1), (3, shape[0] - 5), (shape[0] - 2, shape[0]), (chunks[0], 2 * chunks[0])]:
+        np.testing.assert_array_equal(parallel_read.read_chunks(dset, num_workers=2, rows=(start, stop)),
+                                      dset[start:stop])
+
+
+def test_reads_into_out(h5file):
+    data = np.arange(300, dtype=np.float64).reshape(100, 3)
+    dset = h5file.create_dataset('x', data=data, chunks=(16, 3), compression='gzip')
+    out = np.full((40, 3), -1.0)
+    assert parallel_read.read_chunks(dset, out=out, rows=(30, 70)) is out
+    np.testing.assert_array_equal(out, data[30:70])
+
+
+def test_unwritten_chunks_hold_fillvalue(h5file):
+    dset = h5file.create_dataset('x', shape=(100, 4), dtype=np.float32, chunks=(10, 2),
+                                 compression='gzip', fillvalue=7.5)
+    dset[12:25, 1:3] = 1.0
+    dset[90:] = 2.0
+    np.testing.assert_array_equal(parallel_read.read_chunks(dset), dset[...])
+    np.testing.assert_array_equal(parallel_read.read_chunks(dset, rows=(5, 95)), dset[5:95])
+    np.testing.assert_array_equal(parallel_read.read_chunks(dset, rows=(90, 100)), 2.0)
+
+
+def test_supports_chunk_read(h5file):
+    assert not parallel_read.supports_chunk_read(h5file.create_dataset('a', data=np.zeros(10)))
+    assert not parallel_read.supports_chunk_read(
+        h5file.create_dataset('b', data=np.zeros(10), chunks=(5,), compression='lzf'))
+    assert not parallel_read.supports_chunk_read(
+        h5file.create_dataset('c', data=np.zeros(10), chunks=(5,), compression='gzip', fletcher32=True))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import d4rl
+
+
+def loop_qlearning_dataset(env, dataset, terminate_on_end=False):
+    """The per-transition implementation of qlearning_dataset before it was vectorized."""
+    N = dataset['rewards'].shape[0]
+    obs_, next_obs_, action_, reward_, done_ = [], [], [], [], []
+    use_timeouts = 'timeouts' in dataset
+
+    episode_step = 0
+    for i in range(N-1):
+        done_bool = bool(dataset['terminals'][i])
+        if use_timeouts:
+            final_timestep = dataset['timeouts'][i]
+        else:
+            final_timestep = (episode_step == env._max_episode_steps - 1)
+        if (not terminate_on_end) and final_timestep:
+            episode_step = 0
+            continue
+        if done_bool or final_timestep:
+            episode_step = 0
+
+        obs_.append(dataset['observations'][i].astype(np.float32))
+        next_obs_.append(dataset['observations'][i+1].astype(np.float32))
+        action_.append(dataset['actions'][i].astype(np.float32))
+        reward_.append(dataset['rewards'][i].astype(np.float32))
+        done_.append(done_bool)
+        episode_step += 1
+
+    return {
+        'observations': np.array(obs_),
+        'actions': np.array(action_),
+        'next_observations': np.array(next_obs_),
+        'rewards': np.array(reward_),
+        'terminals': np.array(done_),
+    }
+
+
+def assert_same_transitions(result, expected):
+    assert sorted(result) == sorted(expected)
+    for key in expected:
+        np.testing.assert_array_equal(np.asarray(result[key]), expected[key], err_msg=key)
+        assert np.asarray(result[key]).dtype == expected[key].dtype, key
+
+
+@pytest.mark.parametrize('timeouts', [True, False])
+@pytest.mark.parametrize('terminate_on_end', [False, True])
+@pytest.mark.parametrize('copy_next_observations', [True, False])
+def test_matches_loop(make_dataset, timeouts, terminate_on_end, copy_next_observations):
+    env, h5path = make_dataset(timeouts=timeouts)
+    dataset = env.get_dataset(h5path=h5path)
+    result = d4rl.qlearning_dataset(env, dataset=dataset, terminate_on_end=terminate_on_end,
+                                    copy_next_observations=copy_next_observations)
+    assert_same_transitions(result, loop_qlearning_dataset(env, dataset, terminate_on_end=terminate_on_end))
+
+
+@pytest.mark.parametrize('timeouts', [True, False])
+@pytest.mark.parametrize('terminate_on_end', [False, True])
+@pytest.mark.parametrize('num_shards', [2, 3, 7])
+def test_shards_concatenate_to_unsharded(make_dataset, timeouts, terminate_on_end, num_shards):
+    env, h5path = make_dataset(timeouts=timeouts, terminal_prob=0.01)
+    expected = d4rl.qlearning_dataset(env, h5path=h5path, terminate_on_end=terminate_on_end)
+    shards = [d4rl.qlearning_dataset(env, h5path=h5path, terminate_on_end=terminate_on_end,
+                                     shard_index=i, num_shards=num_shards) for i in range(num_shards)]
+    result = {k: np.concatenate([shard[k] for shard in shards]) for k in expected}
+    assert_same_transitions(result, expected)
+
+
+def test_window_is_part_of_whole_dataset(make_dataset):
+    env, h5path = make_dataset(timeouts=False)
+    whole = d4rl.qlearning_dataset(env, h5path=h5path)
+    start, stop = 1234, 2345
+    window = d4rl.qlearning_dataset(env, h5path=h5path, start=start, stop=stop)
+    dataset = env.get_dataset(h5path=h5path)
+    # Transitions are identified by their observation, which is unique.
+    rows = [np.flatnonzero((dataset['observations'] == obs).all(axis=1))[0] for obs in whole['observations']]
+    in_window = (np.array(rows) >= start) & (np.array(rows) < stop)
+    np.testing.assert_array_equal(window['observations'], whole['observations'][in_window])
+    np.testing.assert_array_equal(window['terminals'], whole['terminals'][in_window])
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import d4rl
+from d4rl.utils.dataset_utils import episode_boundaries, nstep_targets, returns_to_go
+
+
+def loop_nstep_targets(rewards, terminals, timeouts, discount, n_step):
+    """Computes the targets of every step by summing its rewards one by one."""
+    N = rewards.shape[0]
+    rtg, nstep_returns, nstep_discounts = np.zeros(N), np.zeros(N), np.zeros(N)
+    next_index = np.zeros(N, dtype=np.int64)
+    ends = list(np.flatnonzero(terminals | timeouts))
+    if not ends or ends[-1] != N - 1:
+        ends.append(N - 1)
+    start = 0
+    for end in ends:
+        for t in range(start, end + 1):
+            rtg[t] = sum(discount ** (k - t) * rewards[k] for k in range(t, end + 1))
+            if terminals[end] and t + n_step > end:
+                nstep_returns[t], nstep_discounts[t] = rtg[t], 0.
+            else:
+                horizon = min(n_step, end - t)
+                nstep_returns[t] = sum(discount ** j * rewards[t + j] for j in range(horizon))
+                nstep_discounts[t] = discount ** horizon
+                next_index[t] = t + horizon
+        start = end + 1
+    return rtg, nstep_returns, nstep_discounts, next_index
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_nstep_targets_match_loop(seed):
+    rng = np.random.RandomState(seed)
+    N = rng.randint(1, 80)
+    rewards = rng.randn(N)
+    terminals = rng.rand(N) < 0.1
+    timeouts = (rng.rand(N) < 0.1) & ~terminals
+    discount = rng.choice([0.5, 0.9, 1.0])
+    n_step = rng.randint(1, 7)
+
+    targets = nstep_targets(rewards, terminals, timeouts, discount, n_step)
+    rtg, nstep_returns, nstep_discounts, next_index = loop_nstep_targets(rewards, terminals, timeouts,
+                                                                         discount, n_step)
+    valid = targets['valid']
+    np.testing.assert_allclose(targets['returns_to_go'], rtg, atol=1e-5)
+    np.testing.assert_allclose(targets['nstep_returns'][valid], nstep_returns[valid], atol=1e-5)
+    np.testing.assert_allclose(targets['nstep_discounts'][valid], nstep_discounts[valid], rtol=1e-6)
+    truncated = targets['nstep_discounts'] == 0
+    np.testing.assert_array_equal(targets['nstep_next_index'][valid & ~truncated], next_index[valid & ~truncated])
+
+    starts, lengths = episode_boundaries(terminals, timeouts)
+    in_episode = np.zeros(N, dtype=np.bool_)
+    if starts.shape[0] > 0:
+        in_episode[:starts[-1] + lengths[-1]] = True
+    np.testing.assert_allclose(returns_to_go(rewards, starts, lengths, discount)[in_episode], rtg[in_episode],
+                               atol=1e-5)
+
+
+@pytest.mark.parametrize('timeouts', [True, False])
+def test_one_step_targets_match_qlearning_dataset(make_dataset, timeouts):
+    env, h5path = make_dataset(timeouts=timeouts)
+    targets = env.get_return_targets(discount=0.9, n_step=1, h5path=h5path)
+    dataset = env.get_dataset(h5path=h5path)
+    transitions = d4rl.qlearning_dataset(env, dataset=dataset)
+    valid = targets['valid']
+    np.testing.assert_allclose(targets['nstep_returns'][valid], transitions['rewards'])
+    np.testing.assert_array_equal(dataset['observations'][targets['nstep_next_index'][valid]],
+                                  transitions['next_observations'])
+    np.testing.assert_array_equal(targets['nstep_discounts'][valid] == 0, transitions['terminals'])
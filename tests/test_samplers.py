@@ -0,0 +1,210 @@
+import numpy as np
+import pytest
+
+import d4rl
+
+
+def make_transitions(num_rows=1000, seed=0):
+    rng = np.random.RandomState(seed)
+    return {
+        'observations': rng.randn(num_rows, 3).astype(np.float32),
+        'actions': rng.randn(num_rows, 2).astype(np.float32),
+        'rewards': np.arange(num_rows, dtype=np.float32),
+        'terminals': rng.rand(num_rows) < 0.1,
+    }
+
+
+def take_batches(sampler, count):
+    # Batch buffers are reused, so every batch is copied.
+    return [{k: v.copy() for k, v in sampler.sample().items()} for _ in range(count)]
+
+
+def rows_of(batch):
+    return batch['rewards'].astype(np.int64)
+
+
+@pytest.mark.parametrize('replace', [True, False])
+def test_same_seed_same_batches(replace):
+    dataset = make_transitions()
+    batches = []
+    for prefetch in [0, 1, 3]:
+        with d4rl.MinibatchSampler(dataset, batch_size=64, seed=42, prefetch=prefetch, replace=replace) as sampler:
+            batches.append(take_batches(sampler, 20))
+    for other in batches[1:]:
+        for a, b in zip(batches[0], other):
+            for k in a:
+                np.testing.assert_array_equal(a[k], b[k])
+    with d4rl.MinibatchSampler(dataset, batch_size=64, seed=43, replace=replace) as sampler:
+        assert not np.array_equal(rows_of(sampler.sample()), rows_of(batches[0][0]))
+
+
+def test_batches_hold_dataset_rows():
+    dataset = make_transitions()
+    with d4rl.MinibatchSampler(dataset, batch_size=128, seed=0, keys=['observations', 'rewards']) as sampler:
+        for batch in take_batches(sampler, 5):
+            assert sorted(batch) == ['observations', 'rewards']
+            np.testing.assert_array_equal(batch['observations'], dataset['observations'][rows_of(batch)])
+
+
+@pytest.mark.parametrize('num_rows, batch_size', [(1000, 100), (1050, 100), (30, 64)])
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_epochs_cover_every_row_once(num_rows, batch_size, prefetch):
+    dataset = make_transitions(num_rows)
+    num_epochs = 3
+    num_batches = -(-num_epochs * num_rows // batch_size)
+    with d4rl.MinibatchSampler(dataset, batch_size=batch_size, seed=0, prefetch=prefetch,
+                               replace=False) as sampler:
+        rows = np.concatenate([rows_of(b) for b in take_batches(sampler, num_batches)])
+    for epoch in range(num_epochs):
+        epoch_rows = rows[epoch * num_rows:(epoch + 1) * num_rows]
+        np.testing.assert_array_equal(np.sort(epoch_rows), np.arange(num_rows))
+
+
+def test_lazy_dataset(tmp_path):
+    dataset = make_transitions()
+    for k, v in list(dataset.items()):
+        path = str(tmp_path / ('%s.npy' % k))
+        np.save(path, v)
+        dataset[k] = np.load(path, mmap_mode='r')
+    with d4rl.MinibatchSampler(dataset, batch_size=250, seed=0, replace=False) as sampler:
+        batches = take_batches(sampler, 4)
+    rows = np.concatenate([rows_of(b) for b in batches])
+    np.testing.assert_array_equal(np.sort(rows), np.arange(1000))
+    for batch in batches:
+        # Indices are sorted so that pages are read in order.
+        assert (np.diff(rows_of(batch)) >= 0).all()
+        np.testing.assert_array_equal(batch['actions'], dataset['actions'][rows_of(batch)])
+
+
+def test_close_stops_thread():
+    sampler = d4rl.MinibatchSampler(make_transitions(), batch_size=32, prefetch=2)
+    sampler.sample()
+    sampler.close()
+    assert not sampler._thread.is_alive()
+    sampler.close()
+    with pytest.raises(ValueError, match='closed'):
+        sampler.sample()
+
+    with d4rl.MinibatchSampler(make_transitions(), batch_size=32) as sampler:
+        next(iter(sampler))
+    assert not sampler._thread.is_alive()
+
+
+def test_worker_error_is_raised():
+    dataset = make_transitions()
+    sampler = d4rl.MinibatchSampler(dataset, batch_size=32, prefetch=1)
+    # A dataset that shrank after the sampler was created.
+    sampler.dataset = {k: v[:0] for k, v in dataset.items()}
+    with pytest.raises(IndexError):
+        for _ in range(4):
+            sampler.sample()
+    assert not sampler._thread.is_alive()
+
+
+def test_invalid_arguments():
+    dataset = make_transitions()
+    with pytest.raises(ValueError, match='entries'):
+        d4rl.MinibatchSampler(dict(dataset, actions=dataset['actions'][:10]), batch_size=8, keys=['actions'])
+    with pytest.raises(ValueError, match='prefetch'):
+        d4rl.MinibatchSampler(dataset, batch_size=8, prefetch=-1)
+
+
+def make_episodes(lengths, seed=0):
+    """Consecutive episodes of the given lengths; observations hold the row index."""
+    num_rows = sum(lengths)
+    ends = np.cumsum(lengths) - 1
+    rng = np.random.RandomState(seed)
+    terminals = np.zeros(num_rows, dtype=np.bool_)
+    timeouts = np.zeros(num_rows, dtype=np.bool_)
+    # Alternate between episodes that terminate and episodes that time out.
+    terminals[ends[::2]] = True
+    timeouts[ends[1::2]] = True
+    episode_ids = np.repeat(np.arange(len(lengths)), lengths)
+    return {
+        'observations': np.arange(num_rows, dtype=np.float64)[:, None].repeat(2, axis=1),
+        'actions': rng.randn(num_rows, 2).astype(np.float32),
+        'rewards': rng.rand(num_rows).astype(np.float32),
+        'terminals': terminals,
+        'timeouts': timeouts,
+    }, episode_ids
+
+
+LENGTHS = [25, 3, 10, 40, 1, 9, 17]
+
+
+@pytest.mark.parametrize('pad', [None, 'left', 'right'])
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_windows_stay_inside_episodes(pad, prefetch):
+    dataset, episode_ids = make_episodes(LENGTHS)
+    seq_len = 10
+    with d4rl.TrajectorySampler(dataset, seq_len=seq_len, batch_size=64, pad=pad, seed=0,
+                                prefetch=prefetch) as sampler:
+        batches = take_batches(sampler, 10)
+    starts = np.concatenate([[0], np.cumsum(LENGTHS)[:-1]])
+    for batch in batches:
+        assert batch['observations'].shape == (64, seq_len, 2)
+        assert batch['mask'].shape == (64, seq_len)
+        for i in range(64):
+            mask = batch['mask'][i]
+            rows = batch['observations'][i, mask, 0].astype(np.int64)
+            assert len(rows) > 0
+            # Consecutive steps of a single episode.
+            np.testing.assert_array_equal(np.diff(rows), 1)
+            assert len(set(episode_ids[rows])) == 1
+            episode = episode_ids[rows[0]]
+            np.testing.assert_array_equal(batch['timesteps'][i, mask], rows - starts[episode])
+            np.testing.assert_array_equal(batch['actions'][i, mask], dataset['actions'][rows])
+            if pad is None:
+                assert mask.all()
+            elif not mask.all():
+                # Only windows cut short by the end of their episode are padded.
+                assert rows[-1] == starts[episode] + LENGTHS[episode] - 1
+                if pad == 'left':
+                    assert not mask[0] and mask[-1]
+                else:
+                    assert mask[0] and not mask[-1]
+
+
+@pytest.mark.parametrize('pad', ['left', 'right'])
+def test_padding_is_masked_and_zero(pad):
+    dataset, _ = make_episodes(LENGTHS)
+    with d4rl.TrajectorySampler(dataset, seq_len=8, batch_size=256, pad=pad, seed=1, prefetch=0) as sampler:
+        batch = sampler.sample()
+    padding = ~batch['mask']
+    assert padding.any()
+    # Contiguous: a prefix for left padding, a suffix for right padding.
+    np.testing.assert_array_equal(padding, np.sort(padding, axis=1)[:, ::-1] if pad == 'left'
+                                  else np.sort(padding, axis=1))
+    for k in ['observations', 'actions', 'rewards', 'terminals', 'timeouts', 'returns_to_go', 'timesteps']:
+        assert not batch[k][padding].any(), k
+
+
+def test_returns_to_go():
+    dataset, episode_ids = make_episodes(LENGTHS)
+    with d4rl.TrajectorySampler(dataset, seq_len=5, batch_size=32, seed=0, prefetch=0) as sampler:
+        batch = sampler.sample()
+    ends = np.cumsum(LENGTHS)
+    rows = batch['observations'][..., 0].astype(np.int64)
+    expected = [dataset['rewards'][row:ends[episode_ids[row]]].sum() for row in rows.reshape(-1)]
+    np.testing.assert_allclose(batch['returns_to_go'].reshape(-1), expected, rtol=1e-5)
+
+
+def test_short_episodes_are_skipped_without_padding():
+    dataset, episode_ids = make_episodes(LENGTHS)
+    sampler = d4rl.TrajectorySampler(dataset, seq_len=20, batch_size=8, prefetch=0)
+    # Only the episodes of 25 and 40 steps hold a full window.
+    assert len(sampler.window_starts) == (25 - 19) + (40 - 19)
+    assert set(episode_ids[sampler.window_starts]) == {0, 3}
+    with pytest.raises(ValueError, match='at least'):
+        d4rl.TrajectorySampler(dataset, seq_len=41, batch_size=8, prefetch=0)
+
+
+def test_epochs_cover_every_window():
+    dataset, _ = make_episodes(LENGTHS)
+    with d4rl.TrajectorySampler(dataset, seq_len=4, batch_size=7, pad='right', seed=0, prefetch=1,
+                                replace=False) as sampler:
+        num_windows = len(sampler.window_starts)
+        assert num_windows == sum(LENGTHS)
+        batches = take_batches(sampler, num_windows // 7)
+    first_rows = np.concatenate([b['observations'][:, 0, 0] for b in batches]).astype(np.int64)
+    np.testing.assert_array_equal(np.sort(first_rows), np.arange(num_windows))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import d4rl
+
+
+@pytest.mark.parametrize('timeouts', [True, False])
+def test_default_keys(make_dataset, timeouts):
+    env, h5path = make_dataset(timeouts=timeouts, infos=True)
+    dataset = env.get_dataset(h5path=h5path)
+    trajectories = list(d4rl.sequence_dataset(env, h5path=h5path))
+    assert sorted(trajectories[0]) == ['actions', 'infos/goal', 'infos/qpos', 'observations', 'rewards',
+                                       'terminals'] + (['timeouts'] if timeouts else [])
+    expected = list(d4rl.sequence_dataset(env, dataset=dataset))
+    assert len(trajectories) == len(expected)
+    for trajectory, other in zip(trajectories, expected):
+        for k in other:
+            np.testing.assert_array_equal(trajectory[k], other[k])
+
+
+@pytest.mark.parametrize('from_disk', [True, False])
+def test_selected_keys_and_patterns(make_dataset, from_disk):
+    env, h5path = make_dataset(infos=True)
+    keys = ['observations', 'infos/*']
+    if from_disk:
+        trajectories = list(d4rl.sequence_dataset(env, keys=keys, h5path=h5path))
+    else:
+        trajectories = list(d4rl.sequence_dataset(env, dataset=env.get_dataset(h5path=h5path), keys=keys))
+    assert len(trajectories) > 1
+    dataset = env.get_dataset(h5path=h5path)
+    start = 0
+    for trajectory in trajectories:
+        assert sorted(trajectory) == ['infos/goal', 'infos/qpos', 'observations']
+        length = trajectory['observations'].shape[0]
+        np.testing.assert_array_equal(trajectory['infos/qpos'], dataset['infos/qpos'][start:start+length])
+        start += length
+
+
+def test_only_observations(make_dataset):
+    env, h5path = make_dataset()
+    trajectories = list(d4rl.sequence_dataset(env, keys=['observations'], h5path=h5path))
+    assert all(list(trajectory) == ['observations'] for trajectory in trajectories)
+    assert sum(len(t['observations']) for t in trajectories) == env.get_episode_index(h5path=h5path)['lengths'].sum()
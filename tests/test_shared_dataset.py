@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import d4rl
+from d4rl.utils.shared_dataset import _attach
+
+
+def make_dataset():
+    rng = np.random.RandomState(0)
+    return {
+        'observations': rng.randn(1000, 11).astype(np.float32),
+        'actions': rng.randn(1000, 3),
+        'terminals': rng.rand(1000) < 0.01,
+        'timeouts': np.zeros(1000, dtype=np.bool_),
+        'metadata/algorithm': b'SAC',
+    }
+
+
+def _read_in_child(handle, results):
+    dataset = handle.get()
+    results.put({k: np.array(v) if isinstance(v, np.ndarray) else v for k, v in dataset.items()})
+    del dataset
+    handle.close()
+
+
+def _shm_exists(name):
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+def test_child_process_reads_shared_arrays():
+    dataset = make_dataset()
+    handle = d4rl.share_dataset(dataset)
+    # Only the name and layout of the block are pickled.
+    assert len(pickle.dumps(handle)) < 1024
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_read_in_child, args=(handle, results)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    received = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    for result in received:
+        assert sorted(result) == sorted(dataset)
+        for k, value in dataset.items():
+            np.testing.assert_array_equal(result[k], value, err_msg=k)
+
+    # Workers exiting does not free the block, only the owner's unlink does.
+    assert _shm_exists(handle.name)
+    local = handle.get()
+    assert not local['observations'].flags.writeable
+    del local
+    handle.unlink()
+    assert not _shm_exists(handle.name)
+    if os.path.isdir('/dev/shm'):
+        assert not os.path.exists(os.path.join('/dev/shm', handle.name.lstrip('/')))
+
+
+def test_only_owner_can_unlink():
+    handle = d4rl.share_dataset(make_dataset())
+    copy = pickle.loads(pickle.dumps(handle))
+    try:
+        np.testing.assert_array_equal(copy.get()['actions'], make_dataset()['actions'])
+        copy.close()
+        with pytest.raises(ValueError, match='Only the process'):
+            copy.unlink()
+    finally:
+        handle.unlink()
+    assert not _shm_exists(handle.name)
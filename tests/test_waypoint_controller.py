@@ -0,0 +1,38 @@
+import numpy as np
+
+from d4rl.pointmaze import maze_layouts
+from d4rl.pointmaze import waypoint_controller
+from d4rl.pointmaze.gridcraft import grid_spec
+
+
+def test_controllers_do_not_share_grid_env():
+    first = waypoint_controller.WaypointController(maze_layouts.MEDIUM_MAZE)
+    second = waypoint_controller.WaypointController(maze_layouts.MEDIUM_MAZE)
+    assert first.planner is second.planner
+    assert first.env is not second.env
+
+    first.env.gs[(1, 1)] = grid_spec.REWARD
+    assert second.env.gs[(1, 1)] == grid_spec.EMPTY
+
+
+def test_batched_controller_matches_single_controllers():
+    maze_str = maze_layouts.MEDIUM_MAZE
+    cells = np.array(np.where(maze_layouts.parse_maze(maze_str) != maze_layouts.WALL)).T.astype(np.float64)
+    rng = np.random.RandomState(0)
+    num_agents = 8
+    location = cells[rng.randint(len(cells), size=num_agents)] + rng.uniform(-.1, .1, size=(num_agents, 2))
+    velocity = np.zeros((num_agents, 2))
+    targets = cells[rng.randint(len(cells), size=num_agents)]
+
+    singles = [waypoint_controller.WaypointController(maze_str) for _ in range(num_agents)]
+    batched = waypoint_controller.BatchedWaypointController(maze_str, num_agents=num_agents)
+    for step in range(300):
+        # Both draw the same waypoint jitter, in agent order.
+        np.random.seed(step)
+        expected = [c.get_action(location[i], velocity[i], targets[i]) for i, c in enumerate(singles)]
+        np.random.seed(step)
+        actions, done = batched.get_action(location, velocity, targets)
+        np.testing.assert_allclose(actions, np.array([a for a, _ in expected]))
+        np.testing.assert_array_equal(done, [d for _, d in expected])
+        velocity = 0.9 * velocity + 0.05 * actions
+        location = location + 0.1 * velocity